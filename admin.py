@@ -0,0 +1,55 @@
+import os
+from functools import wraps
+from flask import Blueprint, jsonify, request, send_from_directory
+from src.services.auth_service import auth_service
+from src.profiling import request_profiler
+from src.memory_watchdog import memory_watchdog
+
+admin_bp = Blueprint('admin', __name__)
+
+def is_admin_request():
+    """True if the request carries an admin session in the X-Session-Token header"""
+    return auth_service.is_admin(request.headers.get('X-Session-Token', ''))
+
+def admin_required(view):
+    """Reject requests that do not carry an admin session"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not is_admin_request():
+            return jsonify({'error': 'Admin session required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@admin_bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    """List captured request profiles, newest first"""
+    try:
+        return jsonify(request_profiler.list_captures()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/profiles/<filename>', methods=['GET'])
+@admin_required
+def download_profile(filename):
+    """Download a captured profile (pstats format)"""
+    try:
+        if filename != os.path.basename(filename) or not filename.endswith('.prof'):
+            return jsonify({'error': 'Invalid profile name'}), 400
+        if not os.path.isfile(os.path.join(request_profiler.directory, filename)):
+            return jsonify({'error': 'Profile not found'}), 404
+        return send_from_directory(request_profiler.directory, filename, as_attachment=True)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/memory', methods=['GET'])
+@admin_required
+def memory_report():
+    """RSS and top allocation sites (when MEMORY_TRACEMALLOC=1) of every worker"""
+    try:
+        return jsonify({
+            'limit_mb': memory_watchdog.limit_bytes / 1048576 or None,
+            'workers': memory_watchdog.collect()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,178 @@
+import fcntl
+import math
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import time
+from functools import wraps
+
+from flask import jsonify, request
+
+from src.local_store import LocalStore
+from src.services.metrics_service import metrics_service
+
+
+class AdmissionController:
+    """
+    Load shedding for write routes, shared by all gunicorn workers on a host.
+
+    Token buckets (per client IP and per patient phone) live in a small SQLite
+    file so every worker sees the same balances. Write concurrency is capped
+    with a fixed set of lock-file slots: a request must hold one slot while it
+    runs, and the OS releases the slot if the worker dies. Requests that cannot
+    get a token or a slot within ADMISSION_WAIT_SECONDS get 429 + Retry-After.
+
+    If the bucket store itself fails, requests are let through rather than
+    turning a limiter problem into an outage.
+    """
+
+    def __init__(self):
+        self.directory = os.getenv('ADMISSION_DIR', os.path.join(tempfile.gettempdir(), 'doctorportal-admission'))
+        self.enabled = os.getenv('ADMISSION_CONTROL', '1') == '1'
+        self.trust_proxy = os.getenv('ADMISSION_TRUST_PROXY', '0') == '1'
+
+        # (burst capacity, tokens refilled per minute)
+        self.ip_limit = (float(os.getenv('RATE_LIMIT_IP_BURST', 10)), float(os.getenv('RATE_LIMIT_IP_PER_MINUTE', 30)))
+        self.phone_limit = (float(os.getenv('RATE_LIMIT_PHONE_BURST', 3)), float(os.getenv('RATE_LIMIT_PHONE_PER_MINUTE', 2)))
+
+        self.write_slots = int(os.getenv('WRITE_CONCURRENCY', 8))
+        self.wait_seconds = float(os.getenv('ADMISSION_WAIT_SECONDS', 2))
+
+        self.buckets = LocalStore(
+            os.path.join(self.directory, 'buckets.db'),
+            'CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)'
+        )
+
+        metrics_service.counter('admission_rejections_total', 'Requests rejected with 429, by reason and route')
+        metrics_service.counter('admission_store_errors_total', 'Rate limit store failures (requests were let through)')
+
+    def take(self, key: str, capacity: float, per_minute: float):
+        """
+        Take one token from a bucket
+
+        Returns:
+            tuple: (allowed, retry_after_seconds)
+        """
+        rate = per_minute / 60.0
+        now = time.time()
+        with self.buckets.transaction() as conn:
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute(
+                'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated',
+                (key, tokens, now)
+            )
+            # Occasionally drop buckets that have been full for a while
+            if random.random() < 0.01:
+                conn.execute('DELETE FROM buckets WHERE updated < ?', (now - 3600,))
+
+        retry_after = 0 if allowed else (1 - tokens) / rate if rate else 60
+        return allowed, retry_after
+
+    def check_rate_limits(self, phone=None):
+        """
+        Apply the per-IP and per-phone buckets to the current request
+
+        Returns:
+            tuple: (reason, retry_after) for a rejection, or None if allowed
+        """
+        checks = [('ip', f'ip:{self._client_ip()}', self.ip_limit)]
+        if phone:
+            digits = re.sub(r'\D', '', phone)
+            if digits:
+                checks.append(('phone', f'phone:{digits}', self.phone_limit))
+
+        for reason, key, (capacity, per_minute) in checks:
+            try:
+                allowed, retry_after = self.take(key, capacity, per_minute)
+            except sqlite3.Error as e:
+                print(f"Rate limit store error: {e}")
+                metrics_service.inc('admission_store_errors_total')
+                return None
+            if not allowed:
+                return reason, retry_after
+        return None
+
+    def acquire_write_slot(self):
+        """
+        Wait up to wait_seconds for one of the shared write slots
+
+        Returns:
+            int or None: file descriptor holding the slot, None if all are busy
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        deadline = time.monotonic() + self.wait_seconds
+        while True:
+            for slot in range(self.write_slots):
+                fd = os.open(os.path.join(self.directory, f'write-slot-{slot}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return fd
+                except BlockingIOError:
+                    os.close(fd)
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(0.02)
+
+    def release_write_slot(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _client_ip(self):
+        if self.trust_proxy and request.access_route:
+            return request.access_route[0]
+        return request.remote_addr or 'unknown'
+
+
+def _too_many_requests(reason, retry_after):
+    metrics_service.inc('admission_rejections_total', reason=reason, route=request.url_rule.rule if request.url_rule else 'unmatched')
+    response = jsonify({'error': 'Too many requests, please try again shortly'})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def rate_limited(phone_field=None):
+    """Route decorator: per-IP token bucket, plus per-phone when phone_field is in the JSON body"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if admission_controller.enabled:
+                phone = None
+                if phone_field:
+                    data = request.get_json(silent=True)
+                    if isinstance(data, dict) and isinstance(data.get(phone_field), str):
+                        phone = data[phone_field]
+                rejection = admission_controller.check_rate_limits(phone)
+                if rejection:
+                    return _too_many_requests(*rejection)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_slot(view):
+    """Route decorator: run only while holding one of the shared write slots"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not admission_controller.enabled:
+            return view(*args, **kwargs)
+
+        fd = admission_controller.acquire_write_slot()
+        if fd is None:
+            return _too_many_requests('concurrency', admission_controller.wait_seconds)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            admission_controller.release_write_slot(fd)
+    return wrapper
+
+# Global instance
+admission_controller = AdmissionController()
@@ -0,0 +1,179 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, delete, distinct, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+from src.models.daily_stats import DailyStats, MedicineStats
+from src.services.archive_service import archive_service
+from src.flush_changes import prescribed_appointments
+from src.lazy import lazy_instance, listen
+
+class AnalyticsService:
+    """
+    Keeps the DailyStats and MedicineStats summary tables up to date.
+
+    Counters are incremented in the same transaction that inserts the
+    appointment or prescription (from a session after_flush hook), so the
+    summaries never drift from the raw tables and reading them does not
+    depend on how much history has accumulated. Prescriptions are counted
+    on the day their appointment was booked. backfill() rebuilds both
+    tables from scratch with GROUP BYs over the hot tables plus the records
+    in the cold archive, so archiving (before or after a backfill) never
+    removes anything from the summaries.
+    """
+
+    def get_stats(self, days: int = 30, top: int = 10) -> dict:
+        """
+        Read the summaries for the last `days` days
+
+        Args:
+            days: Number of days (including today) to return
+            top: Number of most prescribed medicines to return
+
+        Returns:
+            dict: daily rows, totals over the window and top medicines
+        """
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        daily = DailyStats.query.filter(DailyStats.day >= since).order_by(DailyStats.day).all()
+        medicines = MedicineStats.query.order_by(MedicineStats.prescriptions.desc()).limit(top).all()
+
+        totals = {
+            'appointments': sum(row.appointments for row in daily),
+            'consultations': sum(row.consultations for row in daily),
+            'prescriptions': sum(row.prescriptions for row in daily)
+        }
+        totals['prescriptions_per_appointment'] = (
+            round(totals['prescriptions'] / totals['consultations'], 2) if totals['consultations'] else 0
+        )
+
+        return {
+            'since': since.isoformat(),
+            'daily': [row.to_dict() for row in daily],
+            'totals': totals,
+            'top_medicines': [row.to_dict() for row in medicines]
+        }
+
+    def backfill(self) -> dict:
+        """Rebuild both summary tables from the raw appointment/prescription tables and the archive"""
+        booked_day = func.date(Appointment.timestamp)
+        medicine_key = func.lower(func.trim(Prescription.medicine))
+
+        days = defaultdict(lambda: {'appointments': 0, 'consultations': 0, 'prescriptions': 0})
+        for day, count in db.session.execute(
+            select(booked_day, func.count(Appointment.id)).group_by(booked_day)
+        ):
+            days[_as_date(day)]['appointments'] = count
+        for day, prescriptions, consultations in db.session.execute(
+            select(booked_day, func.count(Prescription.id), func.count(distinct(Prescription.appointment_id)))
+            .join(Appointment, Appointment.id == Prescription.appointment_id)
+            .group_by(booked_day)
+        ):
+            days[_as_date(day)]['prescriptions'] = prescriptions
+            days[_as_date(day)]['consultations'] = consultations
+
+        medicines = {
+            key: [name, count] for key, name, count in db.session.execute(
+                select(medicine_key, func.min(func.trim(Prescription.medicine)), func.count(Prescription.id))
+                .group_by(medicine_key)
+            )
+        }
+
+        # Archived appointments are no longer in the hot tables
+        for record in archive_service.iter_records():
+            counts = days[_as_date(record['timestamp'])]
+            counts['appointments'] += 1
+            if record['prescriptions']:
+                counts['consultations'] += 1
+                counts['prescriptions'] += len(record['prescriptions'])
+            for prescription in record['prescriptions']:
+                name = prescription['medicine'].strip()
+                entry = medicines.setdefault(name.lower(), [name, 0])
+                entry[0] = min(entry[0], name)
+                entry[1] += 1
+
+        db.session.execute(delete(DailyStats))
+        db.session.execute(delete(MedicineStats))
+        if days:
+            db.session.execute(insert(DailyStats), [{'day': day, **counts} for day, counts in days.items()])
+        if medicines:
+            db.session.execute(insert(MedicineStats), [
+                {'key': key[:200], 'medicine': name[:200], 'prescriptions': count}
+                for key, (name, count) in medicines.items()
+            ])
+        db.session.commit()
+
+        return {'days': len(days), 'medicines': len(medicines)}
+
+    def _after_flush(self, session, flush_context):
+        day_deltas = defaultdict(lambda: {'appointments': 0, 'consultations': 0, 'prescriptions': 0})
+        medicine_deltas = {}  # key: [display name, count]
+
+        for obj in session.new:
+            if isinstance(obj, Appointment):
+                day_deltas[_as_date(obj.timestamp)]['appointments'] += 1
+            elif isinstance(obj, Prescription):
+                name = obj.medicine.strip()[:200]
+                medicine_deltas.setdefault(name.lower(), [name, 0])[1] += 1
+
+        if not day_deltas and not medicine_deltas:
+            return
+
+        for appointment in prescribed_appointments(session, flush_context).values():
+            deltas = day_deltas[_as_date(appointment['timestamp'])]
+            deltas['prescriptions'] += appointment['new_prescriptions']
+            # The appointment becomes a consultation with its first prescriptions
+            if appointment['first']:
+                deltas['consultations'] += 1
+
+        conn = session.connection()
+        for day, deltas in day_deltas.items():
+            _increment(conn, DailyStats.__table__, {'day': day}, {k: v for k, v in deltas.items() if v})
+        for key, (name, count) in medicine_deltas.items():
+            _increment(conn, MedicineStats.__table__, {'key': key}, {'prescriptions': count}, {'medicine': name})
+
+
+def _as_date(value):
+    """Normalise a datetime, date or ISO string (SQLite's date()) to a date"""
+    if value is None:
+        return datetime.utcnow().date()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _increment(conn, table, keys, increments, insert_only=None):
+    """Add increments to the row identified by keys, creating it if needed"""
+    if not increments:
+        return
+    values = {**keys, **(insert_only or {}), **increments}
+
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        dialect_insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + stmt.excluded[column] for column in increments}
+        )
+        conn.execute(stmt)
+        return
+
+    where = and_(*(table.c[column] == value for column, value in keys.items()))
+    result = conn.execute(
+        update(table).where(where).values({column: table.c[column] + n for column, n in increments.items()})
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(**values))
+
+def register_listeners(session_class):
+    """Start maintaining the summaries for sessions of the given class"""
+    listen(session_class, analytics_service, 'after_flush')
+
+# Global instance, built on first use
+analytics_service = lazy_instance(AnalyticsService)
@@ -1,9 +1,19 @@
 from flask import Blueprint, jsonify, request
 from src.models.appointment import Appointment, db
+from src.db_profile import read_only
+from src.admission import rate_limited, write_slot
+from src.idempotency import idempotent
+from src.services.search_service import appointment_search_service
+from src.services.patient_history_service import patient_history_service
+from src.services.token_cache_service import token_cache_service
+from src.services.queue_service import queue_service
 
 appointment_bp = Blueprint('appointment', __name__)
 
 @appointment_bp.route('/appointments', methods=['POST'])
+@idempotent
+@rate_limited(phone_field='phone')
+@write_slot
 def create_appointment():
     """Create a new appointment and return the generated token"""
     try:
@@ -34,6 +44,7 @@ def create_appointment():
         return jsonify({'error': str(e)}), 500
 
 @appointment_bp.route('/appointments', methods=['GET'])
+@read_only
 def get_appointments():
     """Get all appointments for the doctor dashboard"""
     try:
@@ -42,11 +53,62 @@ def get_appointments():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@appointment_bp.route('/appointments/search', methods=['GET'])
+@read_only
+def search_appointments():
+    """Full-text search over patient name, phone and issue"""
+    try:
+        query = request.args.get('q', '').strip()
+        
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+        
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+        
+        return jsonify(appointment_search_service.search(query, page=page, per_page=per_page))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@appointment_bp.route('/appointments/history', methods=['GET'])
+@read_only
+def get_patient_history():
+    """Get a patient's earlier visits and prescriptions by phone number"""
+    try:
+        phone = request.args.get('phone', '').strip()
+        
+        if not phone:
+            return jsonify({'error': 'Phone number is required'}), 400
+        
+        history = patient_history_service.get_history(phone)
+        if history is None:
+            return jsonify({'error': 'Invalid phone number'}), 400
+        
+        return jsonify(history)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @appointment_bp.route('/appointments/<string:token>', methods=['GET'])
 def get_appointment_by_token(token):
     """Get a specific appointment by token"""
     try:
-        appointment = Appointment.query.filter_by(token=token).first_or_404()
-        return jsonify(appointment.to_dict())
+        # Cached, including unknown tokens; includes archived appointments
+        appointment = token_cache_service.lookup(token)
+        if appointment:
+            return jsonify(appointment)
+        
+        return jsonify({'error': 'Appointment not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@appointment_bp.route('/appointments/<string:token>/queue', methods=['GET'])
+def get_queue_position(token):
+    """Get the number of patients ahead of a token and the estimated wait"""
+    try:
+        position = queue_service.get_position(token)
+        if position is None:
+            return jsonify({'error': 'Appointment not found'}), 404
+        
+        return jsonify(position)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
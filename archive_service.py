@@ -0,0 +1,213 @@
+import gzip
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert
+
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+from src.models.archived_appointment import ArchivedAppointment
+from src.models.dispatch_job import DispatchJob
+from src.lazy import lazy_instance
+
+class ArchiveService:
+    """
+    Moves old appointments and their prescriptions out of the hot tables.
+
+    Records are appended to month-partitioned gzip JSON-lines files
+    (ARCHIVE_DIR/YYYY/YYYY-MM.jsonl.gz), one gzip member per batch. The
+    ArchivedAppointment table maps each token to its file and member offset,
+    so a lookup decompresses a single batch instead of the whole month.
+
+    The analytics summaries are not touched: archived visits stay counted,
+    and AnalyticsService.backfill() reads them back through iter_records(),
+    so archiving and backfill-stats can run in either order. PatientPhone
+    rows are kept as well, so patient history still lists archived visits.
+    """
+
+    def __init__(self):
+        self.archive_dir = os.getenv(
+            'ARCHIVE_DIR', os.path.join(os.path.dirname(__file__), '..', 'database', 'archive')
+        )
+        self.archive_after_days = int(os.getenv('ARCHIVE_AFTER_DAYS', 365))
+
+    def archive_old_records(self, older_than_days: int = None, batch_size: int = 500) -> dict:
+        """
+        Archive appointments booked more than `older_than_days` days ago
+
+        Args:
+            older_than_days: Age threshold (defaults to ARCHIVE_AFTER_DAYS)
+            batch_size: Appointments moved per transaction
+
+        Returns:
+            dict: Number of appointments and prescriptions archived
+        """
+        days = self.archive_after_days if older_than_days is None else older_than_days
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        archived = {'appointments': 0, 'prescriptions': 0}
+
+        while True:
+            appointments = (
+                Appointment.query
+                .filter(Appointment.timestamp < cutoff)
+                .order_by(Appointment.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not appointments:
+                break
+
+            ids = [appointment.id for appointment in appointments]
+            prescriptions = {}
+            for prescription in Prescription.query.filter(Prescription.appointment_id.in_(ids)):
+                prescriptions.setdefault(prescription.appointment_id, []).append(prescription.to_dict())
+
+            # Group by booking month, one gzip member per month per batch
+            partitions = {}
+            for appointment in appointments:
+                partitions.setdefault(appointment.timestamp.strftime('%Y-%m'), []).append(appointment)
+
+            try:
+                # Remove the hot rows first (children before parents), so a
+                # constraint failure rolls back before anything is written
+                for model, column in (
+                    (Prescription, Prescription.appointment_id),
+                    (DispatchJob, DispatchJob.appointment_id),
+                    (Appointment, Appointment.id),
+                ):
+                    db.session.execute(delete(model).where(column.in_(ids)))
+
+                now = datetime.utcnow()
+                index_rows = []
+                for month, records in partitions.items():
+                    lines = [
+                        json.dumps(self._serialize(appointment, prescriptions.get(appointment.id, [])))
+                        for appointment in records
+                    ]
+                    archive_file, offset = self._append_member(month, lines)
+                    index_rows.extend({
+                        'token': appointment.token,
+                        'appointment_id': appointment.id,
+                        'archive_file': archive_file,
+                        'member_offset': offset,
+                        'booked_at': appointment.timestamp,
+                        'archived_at': now
+                    } for appointment in records)
+
+                # Files are durable before the deletes are committed
+                db.session.execute(insert(ArchivedAppointment), index_rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            db.session.expunge_all()
+
+            archived['appointments'] += len(ids)
+            archived['prescriptions'] += sum(len(items) for items in prescriptions.values())
+
+        return archived
+
+    def find_by_token(self, token: str):
+        """
+        Look up an archived appointment
+
+        Returns:
+            dict or None: The archived appointment with its prescriptions
+        """
+        entry = db.session.get(ArchivedAppointment, token)
+        if entry is None:
+            return None
+        return self.read_entries([entry]).get(token)
+
+    def read_entries(self, entries) -> dict:
+        """
+        Read the records behind ArchivedAppointment index entries
+
+        Entries sharing a gzip member are served by one decompression.
+
+        Returns:
+            dict: token -> archived appointment with its prescriptions
+        """
+        members = {}
+        for entry in entries:
+            members.setdefault((entry.archive_file, entry.member_offset), set()).add(entry.token)
+
+        records = {}
+        for (archive_file, offset), tokens in members.items():
+            for record in self._read_member(archive_file, offset):
+                if record['token'] in tokens:
+                    records[record['token']] = record
+        return records
+
+    def iter_records(self, since=None, until=None):
+        """
+        Yield every archived appointment (with its prescriptions), batch by batch
+
+        Only members listed in the ArchivedAppointment index are read, so a
+        member left behind by a failed run is never reported twice.
+
+        Args:
+            since: Only appointments booked at or after this datetime
+            until: Only appointments booked before this datetime
+        """
+        members = db.session.query(ArchivedAppointment.archive_file, ArchivedAppointment.member_offset).distinct()
+        if since is not None:
+            members = members.filter(ArchivedAppointment.booked_at >= since)
+        if until is not None:
+            members = members.filter(ArchivedAppointment.booked_at < until)
+
+        for archive_file, offset in members.order_by(ArchivedAppointment.archive_file, ArchivedAppointment.member_offset).all():
+            for record in self._read_member(archive_file, offset):
+                booked_at = datetime.fromisoformat(record['timestamp']) if record['timestamp'] else None
+                if since is not None and (booked_at is None or booked_at < since):
+                    continue
+                if until is not None and (booked_at is None or booked_at >= until):
+                    continue
+                yield record
+
+    def _read_member(self, archive_file, offset):
+        """Decompress one gzip member and return its records"""
+        path = os.path.join(self.archive_dir, archive_file)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+            data = b''
+            # A member ends where the decompressor reports unused/EOF
+            while not decompressor.eof:
+                chunk = f.read(64 * 1024)
+                if not chunk:
+                    break
+                data += decompressor.decompress(chunk)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def _serialize(self, appointment, prescriptions):
+        return {
+            'id': appointment.id,
+            'token': appointment.token,
+            'name': appointment.name,
+            'phone': appointment.phone,
+            'issue': appointment.issue,
+            'timestamp': appointment.timestamp.isoformat() if appointment.timestamp else None,
+            'prescriptions': prescriptions,
+            'archived': True
+        }
+
+    def _append_member(self, month, lines):
+        """Append one gzip member to the month's file; returns (relative path, member offset)"""
+        relative = os.path.join(month[:4], f'{month}.jsonl.gz')
+        path = os.path.join(self.archive_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        member = gzip.compress(('\n'.join(lines) + '\n').encode(), compresslevel=9)
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(member)
+            f.flush()
+            os.fsync(f.fileno())
+        return relative, offset
+
+# Global instance, built on first use
+archive_service = lazy_instance(ArchiveService)
@@ -0,0 +1,13 @@
+from src.models.user import db
+
+class ArchivedAppointment(db.Model):
+    """Index entry pointing at an appointment moved to the cold archive"""
+    token = db.Column(db.String(20), primary_key=True)
+    appointment_id = db.Column(db.Integer, nullable=False, index=True)
+    archive_file = db.Column(db.String(255), nullable=False)  # relative to the archive directory
+    member_offset = db.Column(db.BigInteger, nullable=False)  # byte offset of the gzip member holding the record
+    booked_at = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<ArchivedAppointment {self.token}>'
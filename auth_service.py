@@ -1,11 +1,22 @@
 import hashlib
+import os
 import secrets
+import time
 from datetime import datetime, timedelta
 
+from sqlalchemy import delete
+
+from src.lazy import lazy_instance
+from src.models.user import db
+from src.models.auth_session import AuthSession
+
 class AuthService:
     """
     Simple authentication service for doctors.
     In production, this would use proper password hashing and session management.
+    
+    Sessions live in the AuthSession table (keyed by a hash of the token), so
+    a token issued by one gunicorn worker is accepted by all of them.
     """
     
     def __init__(self):
@@ -15,7 +26,10 @@ class AuthService:
             'doctor': self._hash_password('password123'),  # username: doctor, password: password123
             'admin': self._hash_password('admin123')       # username: admin, password: admin123
         }
-        self.active_sessions = {}  # session_token: {username, expires_at}
+        self.admins = {'admin'}  # usernames allowed to use diagnostics endpoints
+        # Expired sessions are swept periodically on login
+        self.cleanup_interval = float(os.getenv('AUTH_CLEANUP_SECONDS', 300))
+        self._last_cleanup = time.monotonic()
     
     def _hash_password(self, password: str) -> str:
         """Hash password using SHA-256 (in production, use bcrypt or similar)"""
@@ -39,14 +53,19 @@ class AuthService:
         if self.doctors[username] != hashed_password:
             return {'success': False, 'message': 'Invalid username or password'}
         
+        if time.monotonic() - self._last_cleanup >= self.cleanup_interval:
+            self.cleanup_expired_sessions()
+        
         # Generate session token
         session_token = secrets.token_urlsafe(32)
         expires_at = datetime.utcnow() + timedelta(hours=8)  # 8 hour session
         
-        self.active_sessions[session_token] = {
-            'username': username,
-            'expires_at': expires_at
-        }
+        db.session.add(AuthSession(
+            token_hash=self._hash_token(session_token),
+            username=username,
+            expires_at=expires_at
+        ))
+        db.session.commit()
         
         return {
             'success': True,
@@ -65,21 +84,35 @@ class AuthService:
         Returns:
             dict: Validation result with user info if valid
         """
-        if not session_token or session_token not in self.active_sessions:
+        if not session_token or not isinstance(session_token, str):
             return {'valid': False, 'message': 'Invalid session token'}
         
-        session = self.active_sessions[session_token]
+        session = db.session.get(AuthSession, self._hash_token(session_token))
+        if session is None:
+            return {'valid': False, 'message': 'Invalid session token'}
         
-        if datetime.utcnow() > session['expires_at']:
-            # Session expired, remove it
-            del self.active_sessions[session_token]
+        if datetime.utcnow() > session.expires_at:
+            # Removed by the next cleanup_expired_sessions()
             return {'valid': False, 'message': 'Session expired'}
         
         return {
             'valid': True,
-            'username': session['username']
+            'username': session.username
         }
     
+    def is_admin(self, session_token: str) -> bool:
+        """
+        Check whether a session token belongs to an admin user
+        
+        Args:
+            session_token: Session token to check
+            
+        Returns:
+            bool: True if the session is valid and the user is an admin
+        """
+        result = self.validate_session(session_token)
+        return result['valid'] and result['username'] in self.admins
+    
     def logout(self, session_token: str) -> bool:
         """
         Logout and invalidate session
@@ -90,21 +123,25 @@ class AuthService:
         Returns:
             bool: True if successfully logged out
         """
-        if session_token in self.active_sessions:
-            del self.active_sessions[session_token]
-            return True
-        return False
+        if not session_token or not isinstance(session_token, str):
+            return False
+        
+        result = db.session.execute(
+            delete(AuthSession).where(AuthSession.token_hash == self._hash_token(session_token))
+        )
+        db.session.commit()
+        return result.rowcount > 0
     
     def cleanup_expired_sessions(self):
-        """Remove expired sessions from memory"""
-        current_time = datetime.utcnow()
-        expired_tokens = [
-            token for token, session in self.active_sessions.items()
-            if current_time > session['expires_at']
-        ]
-        
-        for token in expired_tokens:
-            del self.active_sessions[token]
+        """Delete expired sessions"""
+        self._last_cleanup = time.monotonic()
+        db.session.execute(delete(AuthSession).where(AuthSession.expires_at < datetime.utcnow()))
+        db.session.commit()
+
+    @staticmethod
+    def _hash_token(session_token: str) -> str:
+        # Only a hash is stored, so a copy of the table cannot be replayed
+        return hashlib.sha256(session_token.encode()).hexdigest()
 
-# Global instance
-auth_service = AuthService()
+# Global instance, built on first use
+auth_service = lazy_instance(AuthService)
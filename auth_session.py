@@ -0,0 +1,10 @@
+from src.models.user import db
+
+class AuthSession(db.Model):
+    """A doctor's login session, stored so that every worker can validate it"""
+    token_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the session token
+    username = db.Column(db.String(80), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<AuthSession {self.username}>'
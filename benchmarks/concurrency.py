@@ -0,0 +1,130 @@
+"""
+Per-worker concurrency benchmark: sync vs cooperative (gevent) workers.
+
+Starts a single gunicorn worker of each class, seeds a few prescriptions,
+then drives token status polls and PDF downloads at increasing numbers of
+concurrent clients. A sync worker serves one request at a time, so its
+latency grows with every extra client; a gevent worker overlaps requests
+while they wait on I/O, with PDF rendering offloaded (PDF_RENDER_POOL).
+
+SQLite is local and fast, so the gap is small against the default database.
+Point --database-url at a networked Postgres to see the effect of real I/O
+waits (install psycogreen so psycopg2 yields under gevent).
+
+Run from the project root (gevent must be installed for the cooperative run):
+    python benchmarks/concurrency.py --levels 1 8 32 --duration 10
+"""
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from loadtest import Client, Stats, start_server
+
+MIX = {'status': 3, 'pdf': 1}
+MEDICINES = [
+    {'medicine': 'Paracetamol 500mg', 'dosage': 'Every 6 hours', 'duration': '3 days'},
+    {'medicine': 'Cetirizine 10mg', 'dosage': 'Once at night', 'duration': '5 days'},
+]
+
+
+def seed(host, port, count):
+    client = Client(host, port)
+    tokens = []
+    for i in range(count):
+        status, data = client.request('POST', '/api/appointments/appointments', {
+            'name': f'Patient {i}', 'phone': f'+1555{1000000 + i}', 'issue': 'Follow-up visit'
+        })
+        if status != 201:
+            raise RuntimeError(f'Booking failed with {status}: {data[:200]!r}')
+        token = json.loads(data)['token']
+        status, data = client.request('POST', '/api/consultations', {'token': token, 'medicines': MEDICINES})
+        if status != 202:
+            raise RuntimeError(f'Consultation failed with {status}: {data[:200]!r}')
+        tokens.append(token)
+    return tokens
+
+
+def drive(host, port, tokens, concurrency, duration):
+    stats = Stats()
+    endpoints = list(MIX)
+    weights = [MIX[e] for e in endpoints]
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        client = Client(host, port)
+        while time.perf_counter() < deadline:
+            endpoint = random.choices(endpoints, weights)[0]
+            token = random.choice(tokens)
+            path = (
+                f'/api/appointments/appointments/{token}' if endpoint == 'status'
+                else f'/api/pdf/prescription/{token}/pdf'
+            )
+            started = time.perf_counter()
+            status = client.request('GET', path)[0]
+            stats.record(endpoint, status, time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    requests = sum(len(latencies) for latencies in stats.latencies.values())
+    return {'concurrency': concurrency, 'rps': round(requests / elapsed, 2), 'endpoints': stats.summary(elapsed)}
+
+
+def run_mode(worker_class, args):
+    workdir = tempfile.mkdtemp(prefix='concurrency-')
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    server_args = argparse.Namespace(workers=1, worker_class=worker_class, threads=0, preload=True, admission=False)
+    process, port = start_server(server_args, workdir)
+    try:
+        tokens = seed('127.0.0.1', port, args.patients)
+        time.sleep(1)  # let the dispatch pipeline finish with the seeded jobs
+        return [drive('127.0.0.1', port, tokens, level, args.duration) for level in args.levels]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32], help='Concurrent clients to test')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per level')
+    parser.add_argument('--patients', type=int, default=20)
+    parser.add_argument('--database-url', help='Use this database instead of a temporary SQLite file')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    modes = ['sync']
+    if importlib.util.find_spec('gevent'):
+        modes.append('gevent')
+    else:
+        print('gevent is not installed; only the sync worker is measured', file=sys.stderr)
+
+    results = {mode: run_mode(mode, args) for mode in modes}
+    print(json.dumps(results, indent=2))
+
+    print(f"\n{'worker':<8} {'clients':>8} {'rps':>8} {'status p95':>11} {'pdf p95':>9}")
+    for mode, levels in results.items():
+        for row in levels:
+            endpoints = row['endpoints']
+            print(f"{mode:<8} {row['concurrency']:>8} {row['rps']:>8} "
+                  f"{endpoints.get('status', {}).get('p95_ms', '-'):>11} {endpoints.get('pdf', {}).get('p95_ms', '-'):>9}")
+
+
+if __name__ == '__main__':
+    main()
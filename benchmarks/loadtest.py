@@ -0,0 +1,390 @@
+"""
+Load test for the booking-to-prescription flow.
+
+Starts the app under gunicorn (or targets --url), drives a synthetic
+workload or replays a recorded one, and reports p50/p95/p99 latency and
+requests/sec per endpoint. Results are written as JSON so runs can be
+compared across commits.
+
+Synthetic workload (default, see DEFAULT_WORKLOAD):
+  1. morning rush: concurrent bookings on the appointment create route
+  2. clinic hours: dashboard polling, prescriptions (which send WhatsApp
+     through the mock service) and PDF downloads
+
+Examples (from the project root):
+    python benchmarks/loadtest.py --workers 4 --worker-class sync
+    python benchmarks/loadtest.py --workload my_workload.json
+    python benchmarks/loadtest.py --replay recorded.jsonl
+    python benchmarks/loadtest.py --compare benchmarks/results/<old>.json
+
+A replay file has one request per line:
+    {"offset": 0.25, "method": "POST", "path": "/api/...", "body": {...}}
+where offset is seconds since the start of the recording.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+
+# Route paths as registered in main.py; override with "paths" in a workload file
+DEFAULT_PATHS = {
+    'book': '/api/appointments/appointments',
+    'dashboard': '/api/appointments/appointments',
+    'status': '/api/appointments/appointments/{token}',
+    'prescribe': '/api/prescriptions/prescriptions',
+    'pdf': '/api/pdf/prescription/{token}/pdf',
+}
+
+DEFAULT_WORKLOAD = {
+    'phases': [
+        {'name': 'morning_rush', 'duration': 20, 'concurrency': 32,
+         'mix': {'book': 8, 'status': 2}},
+        {'name': 'clinic_hours', 'duration': 40, 'concurrency': 16,
+         'mix': {'dashboard': 6, 'status': 3, 'prescribe': 1, 'pdf': 2}},
+    ]
+}
+
+ISSUES = ['Fever and headache', 'Persistent cough', 'Back pain', 'Skin rash', 'Follow-up visit']
+MEDICINES = [
+    {'medicine': 'Paracetamol 500mg', 'dosage': 'Every 6 hours', 'duration': '3 days'},
+    {'medicine': 'Cetirizine 10mg', 'dosage': 'Once at night', 'duration': '5 days'},
+    {'medicine': 'Omeprazole 20mg', 'dosage': 'Before breakfast', 'duration': '14 days'},
+]
+
+
+class Stats:
+    """Thread-safe latency and status collection per endpoint"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, status, latency):
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            self.statuses.setdefault(endpoint, {}).setdefault(str(status), 0)
+            self.statuses[endpoint][str(status)] += 1
+            if status == 0 or status >= 500:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        report = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            report[endpoint] = {
+                'requests': len(latencies),
+                'errors': self.errors.get(endpoint, 0),
+                'statuses': self.statuses[endpoint],
+                'rps': round(len(latencies) / elapsed, 2),
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+                'p99_ms': percentile(latencies, 99),
+                'max_ms': round(latencies[-1] * 1000, 2),
+            }
+        return report
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return round(sorted_values[index] * 1000, 2)
+
+
+class Client:
+    """One keep-alive HTTP connection per load-generating thread"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                return response.status, data
+            except (http.client.HTTPException, OSError):
+                # Server closed the keep-alive connection; reconnect once
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    return 0, b''
+
+
+class SyntheticWorkload:
+    """Builds requests for the endpoints in DEFAULT_PATHS, sharing tokens between them"""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.booked = []
+        self.prescribed = []
+        self._lock = threading.Lock()
+
+    def run(self, client, endpoint):
+        if endpoint == 'book':
+            body = {
+                'name': f'Patient {random.randint(1, 10 ** 6)}',
+                'phone': f'+1555{random.randint(1000000, 9999999)}',
+                'issue': random.choice(ISSUES),
+            }
+            status, data = client.request('POST', self.paths['book'], body)
+            if status == 201:
+                with self._lock:
+                    self.booked.append(json.loads(data)['token'])
+            return status
+
+        if endpoint == 'dashboard':
+            return client.request('GET', self.paths['dashboard'])[0]
+
+        if endpoint == 'status':
+            token = self._pick(self.booked)
+            if token is None:
+                return None
+            return client.request('GET', self.paths['status'].format(token=token))[0]
+
+        if endpoint == 'prescribe':
+            with self._lock:
+                token = self.booked.pop(random.randrange(len(self.booked))) if self.booked else None
+            if token is None:
+                return None
+            body = {'token': token, 'medicines': random.sample(MEDICINES, random.randint(1, len(MEDICINES)))}
+            status = client.request('POST', self.paths['prescribe'], body)[0]
+            if status in (200, 201):
+                with self._lock:
+                    self.prescribed.append(token)
+            return status
+
+        if endpoint == 'pdf':
+            token = self._pick(self.prescribed)
+            if token is None:
+                return None
+            return client.request('GET', self.paths['pdf'].format(token=token))[0]
+
+        raise ValueError(f'Unknown endpoint: {endpoint}')
+
+    def _pick(self, tokens):
+        with self._lock:
+            return random.choice(tokens) if tokens else None
+
+
+def run_phase(host, port, workload, phase, stats):
+    endpoints = list(phase['mix'])
+    weights = [phase['mix'][e] for e in endpoints]
+    deadline = time.perf_counter() + phase['duration']
+
+    def worker():
+        client = Client(host, port)
+        while time.perf_counter() < deadline:
+            endpoint = random.choices(endpoints, weights)[0]
+            started = time.perf_counter()
+            status = workload.run(client, endpoint)
+            if status is not None:
+                stats.record(endpoint, status, time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(phase['concurrency'])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_replay(host, port, replay_path, concurrency, stats):
+    with open(replay_path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    entries.sort(key=lambda entry: entry.get('offset', 0))
+
+    cursor = iter(entries)
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def worker():
+        client = Client(host, port)
+        while True:
+            with lock:
+                entry = next(cursor, None)
+            if entry is None:
+                return
+            # Open-loop: keep the recorded timing even when the server is slow
+            delay = started + entry.get('offset', 0) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            request_started = time.perf_counter()
+            status = client.request(entry.get('method', 'GET'), entry['path'], entry.get('body'))[0]
+            label = entry.get('label') or f"{entry.get('method', 'GET')} {entry['path']}"
+            stats.record(label, status, time.perf_counter() - request_started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def start_server(args, workdir):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        METRICS_DIR=os.path.join(workdir, 'metrics'),
+        GUNICORN_PRELOAD='1' if args.preload else '0',
+        # gunicorn.conf.py reads this to monkey-patch early for gevent
+        GUNICORN_WORKER_CLASS=args.worker_class,
+        # All synthetic clients share one IP; rate limits would dominate the numbers
+        ADMISSION_CONTROL='1' if args.admission else '0',
+        ADMISSION_DIR=os.path.join(workdir, 'admission'),
+    )
+    command = [
+        sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--worker-class', args.worker_class,
+        '--log-level', 'warning',
+    ]
+    if args.threads:
+        command += ['--threads', str(args.threads)]
+
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start within 30s')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline.get('commit')} ({baseline_path}):")
+    for endpoint, now in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(endpoint)
+        if not before:
+            continue
+        deltas = []
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            if before.get(key):
+                deltas.append(f"{key} {(now[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"  {endpoint:<12} " + '  '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Target an already running server (host:port) instead of starting gunicorn')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--worker-class', default='sync', help='gunicorn worker class: sync, gthread, gevent, ...')
+    parser.add_argument('--threads', type=int, default=0, help='Threads per worker (gthread)')
+    parser.add_argument('--no-preload', dest='preload', action='store_false')
+    parser.add_argument('--admission', action='store_true', help='Keep rate limiting/load shedding enabled')
+    parser.add_argument('--workload', help='JSON file with phases/mix/paths (defaults to DEFAULT_WORKLOAD)')
+    parser.add_argument('--replay', help='JSON-lines file of recorded requests to replay')
+    parser.add_argument('--concurrency', type=int, default=16, help='Threads used for --replay')
+    parser.add_argument('--duration-scale', type=float, default=1.0, help='Multiply every phase duration')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--output', help='Where to write the JSON result (default benchmarks/results/)')
+    parser.add_argument('--compare', help='Earlier result JSON to compare against')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    workload_config = DEFAULT_WORKLOAD
+    if args.workload:
+        with open(args.workload) as f:
+            workload_config = json.load(f)
+    paths = {**DEFAULT_PATHS, **workload_config.get('paths', {})}
+
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    process = None
+    try:
+        if args.url:
+            host, _, port = args.url.replace('http://', '').partition(':')
+            port = int(port or 80)
+        else:
+            process, port = start_server(args, workdir)
+            host = '127.0.0.1'
+
+        stats = Stats()
+        started = time.perf_counter()
+        if args.replay:
+            run_replay(host, port, args.replay, args.concurrency, stats)
+        else:
+            workload = SyntheticWorkload(paths)
+            for phase in workload_config['phases']:
+                phase = dict(phase, duration=phase['duration'] * args.duration_scale)
+                print(f"Running phase {phase['name']} ({phase['duration']:.0f}s, {phase['concurrency']} clients)")
+                run_phase(host, port, workload, phase, stats)
+        elapsed = time.perf_counter() - started
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'server': 'external' if args.url else {
+            'workers': args.workers,
+            'worker_class': args.worker_class,
+            'threads': args.threads,
+            'preload': args.preload,
+            'admission_control': args.admission,
+        },
+        'workload': args.replay or args.workload or 'synthetic-default',
+        'elapsed_s': round(elapsed, 2),
+        'endpoints': stats.summary(elapsed),
+    }
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{result['commit']}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n{'endpoint':<12} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for endpoint, row in result['endpoints'].items():
+        print(f"{endpoint:<12} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == '__main__':
+    main()
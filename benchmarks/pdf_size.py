@@ -0,0 +1,92 @@
+"""
+Prescription PDF size benchmark.
+
+Renders the same prescriptions in the standard and compact output modes with
+1, 5 and 15 medicines and reports bytes, pages, bytes per page and render
+time. Exits non-zero if a compact render exceeds --budget-bytes-per-page, so
+CI can catch changes that make WhatsApp attachments grow.
+
+Run from the project root:
+    python benchmarks/pdf_size.py --runs 5
+    python benchmarks/pdf_size.py --budget-bytes-per-page 3072
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPOINTMENT = {
+    'name': 'Aarav Sharma',
+    'phone': '+919876543210',
+    'token': 'T-20240101-0001',
+    'issue': 'Persistent dry cough and mild fever for three days, worse at night',
+}
+
+MEDICINE_COUNTS = (1, 5, 15)
+
+
+def prescriptions(count):
+    return [
+        {'medicine': f'Amoxicillin {250 + i * 50}mg', 'dosage': 'One tablet twice daily', 'duration': '7 days'}
+        for i in range(count)
+    ]
+
+
+def count_pages(pdf_bytes):
+    return len(re.findall(rb'/Type /Page\b', pdf_bytes))
+
+
+def measure(pdf_service, count, compact, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        pdf_bytes = pdf_service.render_prescription(APPOINTMENT, prescriptions(count), compact=compact)
+        timings.append(time.perf_counter() - started)
+    pages = count_pages(pdf_bytes)
+    return {
+        'medicines': count,
+        'mode': 'compact' if compact else 'standard',
+        'bytes': len(pdf_bytes),
+        'pages': pages,
+        'bytes_per_page': round(len(pdf_bytes) / pages),
+        'render_median_ms': round(statistics.median(timings) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-bytes-per-page', type=int, default=3072,
+                        help='fail if a compact render exceeds this many bytes per page (0 disables)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_ROOT)
+    from src.services.pdf_service import pdf_service
+
+    # First render pays for importing fpdf; keep it out of the timings
+    pdf_service.render_prescription(APPOINTMENT, prescriptions(1))
+
+    results = [
+        measure(pdf_service, count, compact, args.runs)
+        for count in MEDICINE_COUNTS
+        for compact in (False, True)
+    ]
+    over_budget = [
+        r for r in results
+        if args.budget_bytes_per_page and r['mode'] == 'compact' and r['bytes_per_page'] > args.budget_bytes_per_page
+    ]
+
+    print(json.dumps({'budget_bytes_per_page': args.budget_bytes_per_page, 'results': results}, indent=2))
+    if over_budget:
+        for r in over_budget:
+            print(f"over budget: {r['medicines']} medicines, {r['bytes_per_page']} bytes/page", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
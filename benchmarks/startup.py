@@ -0,0 +1,81 @@
+"""
+Startup-time benchmark.
+
+Measures:
+  * cold start  - a fresh interpreter importing src.main (what a worker pays
+                  without --preload)
+  * worker boot - time from fork() of a preloaded parent until the child has
+                  served its first request (what a worker pays with --preload)
+
+Run from the project root:
+    python benchmarks/startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_cold_start(runs):
+    code = (
+        "import time; t = time.perf_counter(); "
+        "import src.main; "
+        "print(time.perf_counter() - t)"
+    )
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=PROJECT_ROOT)
+        timings.append(float(output.decode().strip().splitlines()[-1]))
+    return timings
+
+
+def measure_worker_boot(runs):
+    sys.path.insert(0, PROJECT_ROOT)
+    from src.main import app
+
+    timings = []
+    for _ in range(runs):
+        read_fd, write_fd = os.pipe()
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            with app.test_client() as client:
+                client.get("/")
+            os.write(write_fd, str(time.perf_counter() - started).encode())
+            os._exit(0)
+        os.close(write_fd)
+        with os.fdopen(read_fd) as pipe:
+            timings.append(float(pipe.read()))
+        os.waitpid(pid, 0)
+    return timings
+
+
+def summarize(timings):
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings) * 1000, 2),
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'max_ms': round(max(timings) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    results = {'cold_start': summarize(measure_cold_start(args.runs))}
+    if hasattr(os, 'fork'):
+        results['preloaded_worker_boot'] = summarize(measure_worker_boot(args.runs))
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
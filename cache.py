@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from src.local_store import LocalStore
+
+# Returned by get() on a miss, so that None can be cached as a value
+MISS = object()
+
+
+class TTLCache:
+    """
+    Small in-process cache with a size bound and a per-entry time to live.
+
+    Entries are evicted least recently used first once max_entries is
+    reached, and treated as missing once they are older than ttl seconds.
+    Each gunicorn worker has its own copy, so the TTL also bounds how long a
+    worker can serve data that another worker has changed.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key: (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or MISS"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISS
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return MISS
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl: float = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class InvalidationLog:
+    """
+    Cache invalidations shared by all gunicorn workers on a host.
+
+    Writers append the keys they changed to a small SQLite file (a
+    LocalStore); each worker reads the entries added since its last check
+    before trusting its cache, which is a single indexed query on a local
+    file. Entries older than `retention` seconds are pruned, so retention
+    must be at least the TTL of the caches it protects.
+    """
+
+    def __init__(self, name: str, retention: float):
+        self.store = LocalStore(
+            os.path.join(
+                os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'doctorportal-cache')), f'{name}.db'
+            ),
+            'CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, created REAL)'
+        )
+        self.retention = retention
+        self._seen = None  # last sequence number this process has applied
+
+    def publish(self, keys):
+        """Record that keys changed"""
+        if not keys:
+            return
+        now = time.time()
+        with self.store.transaction() as conn:
+            conn.executemany('INSERT INTO invalidations (key, created) VALUES (?, ?)', [(key, now) for key in keys])
+            conn.execute('DELETE FROM invalidations WHERE created < ?', (now - self.retention,))
+
+    def changes(self):
+        """
+        Keys published by any process since the last call
+
+        Returns:
+            list or None: changed keys, None if the caller must drop everything
+        """
+        with self.store.connection() as conn:
+            if self._seen is None:
+                self._seen = conn.execute('SELECT coalesce(max(seq), 0) FROM invalidations').fetchone()[0]
+                return None
+            rows = conn.execute('SELECT seq, key FROM invalidations WHERE seq > ? ORDER BY seq', (self._seen,)).fetchall()
+            if rows:
+                self._seen = max(self._seen, rows[-1][0])
+        return [key for _, key in rows]
+
@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+def cooperative() -> bool:
+    """True when running under gevent with the standard library monkey-patched"""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Call func without stalling other requests in this worker
+
+    Under gevent, func runs in a real OS thread from the hub's threadpool
+    while the calling greenlet yields, so CPU-bound work or file I/O does not
+    freeze every other greenlet. Under sync or threaded workers this is a
+    plain call.
+    """
+    if cooperative():
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
+
+
+class OffloadPool:
+    """
+    Where a worker runs CPU-bound jobs such as PDF rendering.
+
+    mode is 'inline' (in the calling thread), 'thread' (see run_blocking) or
+    'process' (a per-worker process pool, which also takes the work off this
+    worker's GIL). 'auto' means 'thread' under gevent and 'inline' otherwise,
+    since a sync worker has nothing else to do while it waits.
+    """
+
+    def __init__(self, mode: str = 'auto', processes: int = 1):
+        self.mode = mode
+        self.processes = processes
+        self._executor = None
+        self._pid = None
+
+    def run(self, func, *args):
+        """Run a module-level function (picklable, for process mode) and return its result"""
+        mode = self.mode
+        if mode == 'auto':
+            mode = 'thread' if cooperative() else 'inline'
+
+        if mode == 'process':
+            future = self._get_executor().submit(func, *args)
+            return run_blocking(future.result)
+        if mode == 'thread':
+            return run_blocking(func, *args)
+        return func(*args)
+
+    def _get_executor(self):
+        # Pools do not survive fork(); create one in the process that uses it.
+        # Children are spawned, not forked, so they never inherit a gevent hub.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context('spawn')
+            )
+            self._pid = os.getpid()
+        return self._executor
@@ -0,0 +1,87 @@
+from flask import Blueprint, current_app, jsonify, request
+from src.models.appointment import Appointment, db
+from src.models.prescription import Prescription
+from src.services.dispatch_service import dispatch_service
+from src.admission import write_slot
+from src.idempotency import idempotent
+
+consultation_bp = Blueprint('consultation', __name__)
+
+MAX_MEDICINES = 50
+
+@consultation_bp.route('', methods=['POST'])
+@idempotent
+@write_slot
+def create_consultation():
+    """
+    Save all prescriptions for an appointment in one transaction, then render
+    the PDF and send it over WhatsApp in the background
+    """
+    try:
+        data = request.json
+        
+        # Validate required fields
+        if not data or 'token' not in data or not isinstance(data.get('medicines'), list):
+            return jsonify({'error': 'Missing required fields: token, medicines'}), 400
+        
+        medicines = data['medicines']
+        if not medicines or len(medicines) > MAX_MEDICINES:
+            return jsonify({'error': f'Provide between 1 and {MAX_MEDICINES} medicines'}), 400
+        for item in medicines:
+            if not isinstance(item, dict) or not all(
+                isinstance(item.get(key), str) and item[key].strip() for key in ['medicine', 'dosage', 'duration']
+            ):
+                return jsonify({'error': 'Each medicine needs medicine, dosage and duration'}), 400
+        
+        appointment = Appointment.query.filter_by(token=data['token']).first()
+        if not appointment:
+            return jsonify({'error': 'Appointment not found'}), 404
+        
+        prescriptions = [
+            Prescription(
+                appointment_id=appointment.id,
+                medicine=item['medicine'].strip(),
+                dosage=item['dosage'].strip(),
+                duration=item['duration'].strip()
+            )
+            for item in medicines
+        ]
+        db.session.add_all(prescriptions)
+        job = dispatch_service.create_job(appointment)
+        db.session.commit()
+        
+        # Only committed data is handed to the pipeline
+        appointment_data = {
+            'name': appointment.name,
+            'phone': appointment.phone,
+            'issue': appointment.issue,
+            'token': appointment.token,
+            'timestamp': appointment.timestamp
+        }
+        prescriptions_data = [
+            {'medicine': p.medicine, 'dosage': p.dosage, 'duration': p.duration} for p in prescriptions
+        ]
+        dispatch_service.enqueue(current_app._get_current_object(), job.id, appointment_data, prescriptions_data)
+        
+        return jsonify({
+            'success': True,
+            'token': appointment.token,
+            'prescriptions': [p.to_dict() for p in prescriptions],
+            'job': job.to_dict(),
+            'status_url': f'{request.path.rstrip("/")}/jobs/{job.id}'
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@consultation_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_dispatch_job(job_id):
+    """Poll the PDF/WhatsApp pipeline status for a consultation"""
+    try:
+        job = dispatch_service.get_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,35 @@
+from src.models.user import db
+
+class DailyStats(db.Model):
+    """Per-day counters, maintained on every appointment/prescription insert"""
+    day = db.Column(db.Date, primary_key=True)  # day the appointment was booked (UTC)
+    appointments = db.Column(db.Integer, nullable=False, default=0)
+    consultations = db.Column(db.Integer, nullable=False, default=0)  # appointments with at least one prescription
+    prescriptions = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailyStats {self.day}>'
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat(),
+            'appointments': self.appointments,
+            'consultations': self.consultations,
+            'prescriptions': self.prescriptions,
+            'prescriptions_per_appointment': round(self.prescriptions / self.consultations, 2) if self.consultations else 0
+        }
+
+class MedicineStats(db.Model):
+    """How often each medicine has been prescribed"""
+    key = db.Column(db.String(200), primary_key=True)  # lower-cased medicine name
+    medicine = db.Column(db.String(200), nullable=False)  # name as first prescribed
+    prescriptions = db.Column(db.Integer, nullable=False, default=0, index=True)
+
+    def __repr__(self):
+        return f'<MedicineStats {self.medicine}>'
+
+    def to_dict(self):
+        return {
+            'medicine': self.medicine,
+            'prescriptions': self.prescriptions
+        }
@@ -0,0 +1,107 @@
+import os
+from functools import wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Bind key used for the read connection/replica in SQLALCHEMY_BINDS
+READ_BIND = 'read'
+
+# Applied to every new SQLite connection. WAL lets readers proceed while a
+# booking is being written; busy_timeout makes writers wait for the lock
+# instead of failing immediately with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # milliseconds
+    'cache_size': -16000,          # negative = KiB, i.e. 16 MB page cache
+    'temp_store': 'MEMORY',
+}
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the read bind while a route marked with
+    @read_only is running. Flushes (inserts/updates/deletes) always go to the
+    primary, and without a configured read bind everything does.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('db_read_only'):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_only(view):
+    """Route decorator: run the view's queries against the read connection."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        try:
+            return view(*args, **kwargs)
+        finally:
+            g.db_read_only = False
+    return wrapper
+
+
+def configure_database(app, default_uri):
+    """
+    Fill in engine settings for the configured database.
+
+    Environment:
+        DATABASE_URL          primary database (defaults to default_uri)
+        DATABASE_READ_URL     optional read connection/replica for @read_only routes
+        DB_POOL_SIZE          Postgres/MySQL pool size (default 5)
+        DB_MAX_OVERFLOW       extra connections allowed above the pool (default 10)
+        DB_POOL_RECYCLE       seconds before a pooled connection is replaced (default 1800)
+    """
+    uri = os.getenv('DATABASE_URL', default_uri)
+    # Heroku-style URLs still use the deprecated scheme
+    if uri.startswith('postgres://'):
+        uri = uri.replace('postgres://', 'postgresql://', 1)
+
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', uri)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    read_uri = os.getenv('DATABASE_READ_URL')
+    if read_uri:
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        binds.setdefault(READ_BIND, {'url': read_uri, **engine_options(read_uri)})
+
+
+def engine_options(uri):
+    """Return create_engine() keyword arguments suited to the database backend."""
+    url = make_url(uri)
+
+    if url.get_backend_name() == 'sqlite':
+        # Python's sqlite3 timeout is the busy handler used before the first
+        # PRAGMA runs; keep it in line with busy_timeout
+        return {'connect_args': {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000}}
+
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_pre_ping': True,
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+
+
+def install_engine_hooks(app, db):
+    """Register per-connection setup on every engine the app uses."""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _apply_sqlite_pragmas):
+                event.listen(engine, 'connect', _apply_sqlite_pragmas)
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
@@ -0,0 +1,26 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+class DispatchJob(db.Model):
+    """Post-commit PDF rendering and WhatsApp delivery for a consultation"""
+    id = db.Column(db.String(32), primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointment.id'), nullable=False, index=True)
+    token = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    steps = db.Column(db.Text, nullable=False)  # JSON: {step: {status, ...details}}
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DispatchJob {self.id} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'token': self.token,
+            'status': self.status,
+            'steps': json.loads(self.steps),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from src.models.user import db
+from src.models.dispatch_job import DispatchJob
+from src.services.metrics_service import metrics_service
+from src.services.pdf_service import pdf_service
+from src.services.whatsapp_service import whatsapp_service
+from src.lazy import lazy_instance
+
+STEPS = ('pdf', 'whatsapp')
+UNFINISHED = ('queued', 'running')
+
+metrics_service.gauge('dispatch_queue_depth', 'Dispatch jobs waiting or running in this worker')
+metrics_service.histogram('dispatch_job_duration_seconds', 'Time from enqueue to job completion')
+metrics_service.counter('dispatch_jobs_total', 'Finished dispatch jobs by result')
+
+class DispatchService:
+    """
+    Runs PDF rendering and WhatsApp delivery after a consultation is committed.
+
+    Each worker process has a small thread pool; job progress is stored in
+    the DispatchJob table so any worker can answer status polls. Jobs must
+    only be enqueued after the prescriptions are committed, so the pipeline
+    never renders data that could still be rolled back.
+
+    A job whose worker died (or that hit an unexpected error) is marked
+    failed: jobs with no progress for DISPATCH_STALE_SECONDS are reaped when
+    a worker starts its pool and when such a job is polled.
+    """
+
+    def __init__(self):
+        self.max_workers = int(os.getenv('DISPATCH_WORKERS', 2))
+        self.stale_after = timedelta(seconds=int(os.getenv('DISPATCH_STALE_SECONDS', 600)))
+        self.output_dir = os.path.join(os.path.dirname(__file__), '..', 'static', 'prescriptions')
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._queued = 0
+
+    def create_job(self, appointment) -> DispatchJob:
+        """Add a queued job for the appointment to the current session (caller commits)"""
+        job = DispatchJob(
+            id=uuid.uuid4().hex,
+            appointment_id=appointment.id,
+            token=appointment.token,
+            status='queued',
+            steps=json.dumps({step: {'status': 'pending'} for step in STEPS})
+        )
+        db.session.add(job)
+        return job
+
+    def enqueue(self, app, job_id: str, appointment_data: dict, prescriptions_data: list):
+        """Hand a committed job to this worker's pipeline"""
+        with self._lock:
+            self._queued += 1
+            metrics_service.set('dispatch_queue_depth', self._queued)
+        self._get_executor().submit(
+            self._run, app, job_id, appointment_data, prescriptions_data, time.perf_counter()
+        )
+
+    def get_job(self, job_id: str):
+        job = db.session.get(DispatchJob, job_id)
+        if job and job.status in UNFINISHED and job.updated_at < datetime.utcnow() - self.stale_after:
+            self.reap_stale_jobs()
+        return job.to_dict() if job else None
+
+    def reap_stale_jobs(self) -> int:
+        """Fail queued or running jobs that have made no progress for stale_after (their worker died)"""
+        stale = DispatchJob.query.filter(
+            DispatchJob.status.in_(UNFINISHED),
+            DispatchJob.updated_at < datetime.utcnow() - self.stale_after
+        ).all()
+        for job in stale:
+            self._fail(job, 'Job was abandoned by its worker')
+        return len(stale)
+
+    def _get_executor(self):
+        # Threads do not survive fork(); create the pool in the process that uses it
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='dispatch')
+            self._pid = os.getpid()
+            self._queued = 0
+            try:
+                self.reap_stale_jobs()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error reaping stale dispatch jobs: {e}")
+        return self._executor
+
+    def _run(self, app, job_id, appointment_data, prescriptions_data, enqueued_at):
+        result = 'failed'
+        try:
+            with app.app_context():
+                job = db.session.get(DispatchJob, job_id)
+                steps = json.loads(job.steps)
+                self._save(job, steps, 'running')
+
+                # Render PDF
+                steps['pdf']['status'] = 'running'
+                self._save(job, steps)
+                try:
+                    os.makedirs(self.output_dir, exist_ok=True)
+                    filename = f"prescription_{job.token}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+                    output_path = os.path.join(self.output_dir, filename)
+                    pdf_service.generate_prescription_pdf(appointment_data, prescriptions_data, output_path, compact=True)
+                    steps['pdf'] = {
+                        'status': 'completed',
+                        'filename': filename,
+                        'download_url': f'/static/prescriptions/{filename}'
+                    }
+                except Exception as e:
+                    steps['pdf'] = {'status': 'failed', 'error': str(e)}
+                    steps['whatsapp'] = {'status': 'skipped'}
+                    self._save(job, steps, 'failed')
+                    return
+                self._save(job, steps)
+
+                # Deliver via WhatsApp
+                steps['whatsapp']['status'] = 'running'
+                self._save(job, steps)
+                delivery = whatsapp_service.send_prescription_pdf(
+                    appointment_data['name'], appointment_data['phone'], appointment_data['token'], output_path
+                )
+                if delivery.get('success'):
+                    steps['whatsapp'] = {'status': 'completed', 'message': delivery.get('message')}
+                    result = 'completed'
+                else:
+                    steps['whatsapp'] = {'status': 'failed', 'error': delivery.get('error')}
+                self._save(job, steps, result)
+        except Exception as e:
+            print(f"Dispatch job {job_id} failed: {e}")
+            # Leave a final state for pollers instead of 'running' forever
+            try:
+                with app.app_context():
+                    db.session.rollback()
+                    job = db.session.get(DispatchJob, job_id)
+                    if job is not None:
+                        self._fail(job, str(e))
+            except Exception as error:
+                print(f"Error marking dispatch job {job_id} failed: {error}")
+        finally:
+            with self._lock:
+                self._queued -= 1
+                metrics_service.set('dispatch_queue_depth', self._queued)
+            metrics_service.observe('dispatch_job_duration_seconds', time.perf_counter() - enqueued_at)
+            metrics_service.inc('dispatch_jobs_total', result=result)
+
+    def _fail(self, job, error):
+        steps = json.loads(job.steps)
+        for step, state in steps.items():
+            if state.get('status') in ('pending', 'running'):
+                steps[step] = {'status': 'failed', 'error': error}
+        self._save(job, steps, 'failed')
+
+    def _save(self, job, steps, status=None):
+        job.steps = json.dumps(steps)
+        if status:
+            job.status = status
+        db.session.commit()
+
+# Global instance, built on first use
+dispatch_service = lazy_instance(DispatchService)
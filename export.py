@@ -0,0 +1,59 @@
+from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from src.services.export_service import export_service
+from src.routes.admin import admin_required
+
+export_bp = Blueprint('export', __name__)
+
+def _include_archived():
+    """?include_archived=0 leaves out appointments moved to the cold archive"""
+    return request.args.get('include_archived', '1') != '0'
+
+def _headers(filename, include_archived):
+    return {
+        'Content-Disposition': f'attachment; filename={filename}',
+        'X-Export-Includes-Archived': '1' if include_archived else '0'
+    }
+
+def _date_range():
+    """Parse optional ?since=YYYY-MM-DD&until=YYYY-MM-DD filters"""
+    since = request.args.get('since')
+    until = request.args.get('until')
+    return (
+        datetime.fromisoformat(since) if since else None,
+        datetime.fromisoformat(until) if until else None
+    )
+
+@export_bp.route('/appointments.csv', methods=['GET'])
+@admin_required
+def export_appointments_csv():
+    """Stream appointments with their prescriptions as CSV"""
+    try:
+        since, until = _date_range()
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO dates (YYYY-MM-DD)'}), 400
+
+    include_archived = _include_archived()
+    filename = f"appointments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(
+        stream_with_context(export_service.iter_csv(since, until, include_archived)),
+        mimetype='text/csv',
+        headers=_headers(filename, include_archived)
+    )
+
+@export_bp.route('/appointments.jsonl', methods=['GET'])
+@admin_required
+def export_appointments_jsonl():
+    """Stream appointments with their prescriptions as JSON lines"""
+    try:
+        since, until = _date_range()
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO dates (YYYY-MM-DD)'}), 400
+
+    include_archived = _include_archived()
+    filename = f"appointments_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    return Response(
+        stream_with_context(export_service.iter_jsonl(since, until, include_archived)),
+        mimetype='application/x-ndjson',
+        headers=_headers(filename, include_archived)
+    )
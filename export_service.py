@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+from src.services.archive_service import archive_service
+from src.lazy import lazy_instance
+
+CSV_COLUMNS = [
+    'appointment_id', 'token', 'name', 'phone', 'issue', 'timestamp',
+    'prescription_id', 'medicine', 'dosage', 'duration', 'archived'
+]
+
+# Spreadsheets evaluate a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+class ExportService:
+    """
+    Streams appointments joined to their prescriptions for audits and claims.
+
+    A single outer-join query ordered by appointment is read through a
+    server-side cursor (stream_results + yield_per) as plain rows, and
+    consecutive rows are grouped per appointment, so memory use depends on
+    the batch size rather than on the size of the tables.
+
+    Appointments moved to the cold archive follow the hot ones (one gzip
+    member at a time, see ArchiveService.iter_records) and are marked
+    archived, unless include_archived is False.
+    """
+
+    def __init__(self, batch_size: int = 1000):
+        self.batch_size = batch_size
+
+    def iter_appointments(self, since=None, until=None, include_archived: bool = True):
+        """
+        Yield one dict per appointment with its prescriptions
+
+        Args:
+            since: Only appointments booked at or after this datetime
+            until: Only appointments booked before this datetime
+            include_archived: Also yield archived appointments, after the hot ones
+        """
+        query = (
+            select(
+                Appointment.id, Appointment.token, Appointment.name, Appointment.phone,
+                Appointment.issue, Appointment.timestamp,
+                Prescription.id.label('prescription_id'), Prescription.medicine,
+                Prescription.dosage, Prescription.duration
+            )
+            .outerjoin(Prescription, Prescription.appointment_id == Appointment.id)
+            .order_by(Appointment.id, Prescription.id)
+            .execution_options(stream_results=True, yield_per=self.batch_size)
+        )
+        if since is not None:
+            query = query.where(Appointment.timestamp >= since)
+        if until is not None:
+            query = query.where(Appointment.timestamp < until)
+
+        current = None
+        for row in db.session.execute(query):
+            if current is None or current['id'] != row.id:
+                if current is not None:
+                    yield current
+                current = {
+                    'id': row.id,
+                    'token': row.token,
+                    'name': row.name,
+                    'phone': row.phone,
+                    'issue': row.issue,
+                    'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+                    'prescriptions': [],
+                    'archived': False
+                }
+            if row.prescription_id is not None:
+                current['prescriptions'].append({
+                    'id': row.prescription_id,
+                    'medicine': row.medicine,
+                    'dosage': row.dosage,
+                    'duration': row.duration
+                })
+        if current is not None:
+            yield current
+
+        if not include_archived:
+            return
+        for record in archive_service.iter_records(since, until):
+            yield {
+                'id': record['id'],
+                'token': record['token'],
+                'name': record['name'],
+                'phone': record['phone'],
+                'issue': record['issue'],
+                'timestamp': record['timestamp'],
+                'prescriptions': [
+                    {key: prescription[key] for key in ('id', 'medicine', 'dosage', 'duration')}
+                    for prescription in record['prescriptions']
+                ],
+                'archived': True
+            }
+
+    def iter_jsonl(self, since=None, until=None, include_archived: bool = True):
+        """Yield JSON lines, one appointment (with nested prescriptions) per line"""
+        for appointment in self.iter_appointments(since, until, include_archived):
+            yield json.dumps(appointment) + '\n'
+
+    def iter_csv(self, since=None, until=None, include_archived: bool = True, rows_per_chunk: int = 500):
+        """Yield CSV text in chunks, one row per prescription (appointments without any get one empty row)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+
+        rows = 0
+        for appointment in self.iter_appointments(since, until, include_archived):
+            base = [
+                appointment['id'], appointment['token'], _csv_text(appointment['name']), _csv_text(appointment['phone']),
+                _csv_text(appointment['issue']), appointment['timestamp']
+            ]
+            for prescription in appointment['prescriptions'] or [None]:
+                if prescription is None:
+                    writer.writerow(base + ['', '', '', '', int(appointment['archived'])])
+                else:
+                    writer.writerow(base + [
+                        prescription['id'], _csv_text(prescription['medicine']), _csv_text(prescription['dosage']),
+                        _csv_text(prescription['duration']),
+                        int(appointment['archived'])
+                    ])
+                rows += 1
+
+            if rows >= rows_per_chunk:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                rows = 0
+
+        yield buffer.getvalue()
+
+
+def _csv_text(value):
+    """Quote free text so a spreadsheet shows it instead of running it (e.g. '=HYPERLINK(...)')"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+# Global instance, built on first use
+export_service = lazy_instance(ExportService)
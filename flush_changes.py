@@ -0,0 +1,48 @@
+from sqlalchemy import func, select
+
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+
+
+def prescribed_appointments(session, flush_context) -> dict:
+    """
+    Appointments that received new prescriptions in this flush
+
+    Several after_flush hooks (analytics, queue, token cache, patient
+    history) need the same facts about these appointments, so they are read
+    with one grouped query on the first call and kept on the flush context
+    for the others.
+
+    Returns:
+        dict: appointment id -> {token, phone, timestamp, new_prescriptions,
+        first}, where first means these are the appointment's first
+        prescriptions (it has just been served)
+    """
+    cached = flush_context.attributes.get('prescribed_appointments')
+    if cached is not None:
+        return cached
+
+    new_counts = {}
+    for obj in session.new:
+        if isinstance(obj, Prescription):
+            new_counts[obj.appointment_id] = new_counts.get(obj.appointment_id, 0) + 1
+
+    appointments = {}
+    if new_counts:
+        rows = session.connection().execute(
+            select(Appointment.id, Appointment.token, Appointment.phone, Appointment.timestamp, func.count(Prescription.id))
+            .outerjoin(Prescription, Prescription.appointment_id == Appointment.id)
+            .where(Appointment.id.in_(new_counts))
+            .group_by(Appointment.id, Appointment.token, Appointment.phone, Appointment.timestamp)
+        )
+        for appointment_id, token, phone, timestamp, total in rows:
+            appointments[appointment_id] = {
+                'token': token,
+                'phone': phone,
+                'timestamp': timestamp,
+                'new_prescriptions': new_counts[appointment_id],
+                'first': total == new_counts[appointment_id]
+            }
+
+    flush_context.attributes['prescribed_appointments'] = appointments
+    return appointments
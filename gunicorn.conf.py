@@ -0,0 +1,58 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Gunicorn settings for the clinic app: `gunicorn -c gunicorn.conf.py`
+wsgi_app = "src.main:app"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))  # per gevent worker
+
+# gevent workers patch the standard library when they start, which is too
+# late for a preloaded app: locks, sockets and pools created while importing
+# it would be the blocking originals. Patch here, before anything is loaded.
+if worker_class == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        # Optional: lets psycopg2 (Postgres) queries yield to other greenlets
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        pass
+    else:
+        patch_psycopg()
+
+# Optional time-independent recycling; src.memory_watchdog recycles on RSS
+# instead (MEMORY_LIMIT_MB). Both let in-flight requests finish first.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 0))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+# Build the app (imports, schema setup) once in the master and fork workers
+# from it. Pooled DB connections are reset in each child by the at-fork hook
+# registered in create_app().
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# Schema setup (create_all, search index) belongs in the preloading master.
+# Without preload every worker would import the app and run it, so it is
+# switched off there and on_starting runs `flask init-db` once instead.
+os.environ.setdefault("AUTO_CREATE_SCHEMA", "1" if preload_app else "0")
+
+
+def worker_exit(server, worker):
+    # Publish the exiting worker's last counts (also done at exit, this is
+    # the earliest point for a worker recycled by max_requests or SIGTERM)
+    from src.services.metrics_service import metrics_service
+    metrics_service.flush()
+
+
+def on_starting(server):
+    # Per-worker metric snapshots from a previous run would otherwise be
+    # merged into this run's /metrics output
+    from src.services.metrics_service import metrics_service
+    metrics_service.reset_directory()
+
+    if not preload_app and os.environ["AUTO_CREATE_SCHEMA"] == "0" and os.getenv("GUNICORN_INIT_DB", "1") == "1":
+        subprocess.run([sys.executable, "-m", "flask", "--app", wsgi_app, "init-db"], check=True)
@@ -0,0 +1,149 @@
+import hashlib
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from src.models.user import db
+from src.models.idempotency_key import IdempotencyKey
+from src.services.metrics_service import metrics_service
+
+# How long a completed response is replayed for
+TTL = timedelta(hours=int(os.getenv('IDEMPOTENCY_TTL_HOURS', 24)))
+
+# How long a duplicate waits for the first request to finish before giving up
+WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+
+# An in-progress key older than this is assumed abandoned (worker died) and is taken over
+ABANDONED_AFTER = timedelta(seconds=int(os.getenv('IDEMPOTENCY_ABANDONED_SECONDS', 120)))
+
+metrics_service.counter('idempotency_requests_total', 'Requests carrying an Idempotency-Key, by outcome')
+
+table = IdempotencyKey.__table__
+
+
+def idempotent(view):
+    """
+    Route decorator implementing the Idempotency-Key header.
+
+    The first request with a key claims it (an 'in_progress' row) and runs
+    the view; its response is stored unless it was a 5xx or 429, which the
+    client is expected to retry. Retries with the same key and body get the
+    stored response without re-running the view. A duplicate that arrives
+    while the first request is still running waits for it instead of
+    racing it. Reusing a key with a different body is a 422.
+
+    Key rows live in their own transactions so they are unaffected by the
+    view's commit or rollback.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+
+        scope = f'{request.method} {request.path}'
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+
+        stored = _claim(key, scope, request_hash)
+        if stored is not None:
+            return stored
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(key, scope)
+            raise
+
+        if response.status_code >= 500 or response.status_code == 429 or response.direct_passthrough:
+            _release(key, scope)
+        else:
+            _complete(key, scope, response)
+        metrics_service.inc('idempotency_requests_total', outcome='executed')
+        return response
+    return wrapper
+
+
+def purge_expired():
+    """Delete key rows past their TTL"""
+    with db.engine.begin() as conn:
+        return conn.execute(delete(table).where(table.c.expires_at < datetime.utcnow())).rowcount
+
+
+def _claim(key, scope, request_hash):
+    """
+    Claim the key for this request.
+
+    Returns:
+        None if this request should run the view, otherwise the response to send
+    """
+    if random.random() < 0.01:
+        purge_expired()
+
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(insert(table).values(
+                    key=key, scope=scope, request_hash=request_hash, status='in_progress',
+                    created_at=now, expires_at=now + TTL
+                ))
+            return None
+        except IntegrityError:
+            pass
+
+        with db.engine.connect() as conn:
+            row = conn.execute(select(table).where(table.c.key == key, table.c.scope == scope)).first()
+
+        if row is None:
+            continue  # released in the meantime, try to claim again
+
+        if row.expires_at < now or (row.status == 'in_progress' and row.created_at < now - ABANDONED_AFTER):
+            _release(key, scope)
+            continue
+
+        if row.request_hash != request_hash:
+            metrics_service.inc('idempotency_requests_total', outcome='mismatch')
+            return jsonify({'error': 'Idempotency-Key was already used with a different request body'}), 422
+
+        if row.status == 'completed':
+            metrics_service.inc('idempotency_requests_total', outcome='replayed')
+            response = Response(row.response_body, status=row.response_code, content_type=row.content_type)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        if time.monotonic() >= deadline:
+            metrics_service.inc('idempotency_requests_total', outcome='conflict')
+            response = jsonify({'error': 'A request with this Idempotency-Key is still being processed'})
+            response.status_code = 409
+            response.headers['Retry-After'] = '1'
+            return response
+
+        time.sleep(0.05)
+
+
+def _complete(key, scope, response):
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(table)
+            .where(table.c.key == key, table.c.scope == scope)
+            .values(
+                status='completed',
+                response_code=response.status_code,
+                response_body=response.get_data(as_text=True),
+                content_type=response.content_type
+            )
+        )
+
+
+def _release(key, scope):
+    with db.engine.begin() as conn:
+        conn.execute(delete(table).where(table.c.key == key, table.c.scope == scope))
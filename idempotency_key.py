@@ -0,0 +1,16 @@
+from src.models.user import db
+
+class IdempotencyKey(db.Model):
+    """Stored outcome of a request sent with an Idempotency-Key header"""
+    key = db.Column(db.String(255), primary_key=True)
+    scope = db.Column(db.String(255), primary_key=True)  # "METHOD /path" the key was used on
+    request_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the request body
+    status = db.Column(db.String(20), nullable=False)  # 'in_progress' or 'completed'
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.scope} {self.key}>'
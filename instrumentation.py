@@ -0,0 +1,72 @@
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from src.services.metrics_service import metrics_service
+
+
+def init_instrumentation(app, db):
+    """
+    Record per-route latency and per-request SQL statistics into metrics_service.
+
+    SQL time is measured around each cursor execute on every engine the app
+    uses, so it covers ORM queries, raw text() statements and flushes alike.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+                event.listen(engine, 'handle_error', _discard_query_timer)
+
+    app.before_request(_start_request_timer)
+    app.after_request(_record_request)
+
+
+def _start_request_timer():
+    g.metrics_started = time.perf_counter()
+    g.db_query_count = 0
+    g.db_query_time = 0.0
+
+
+def _record_request(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+
+    # Use the route pattern, not the raw path, to keep label cardinality bounded
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    blueprint = request.blueprint or 'app'
+
+    metrics_service.observe(
+        'http_request_duration_seconds', time.perf_counter() - started,
+        blueprint=blueprint, route=route, method=request.method
+    )
+    metrics_service.inc(
+        'http_requests_total',
+        blueprint=blueprint, route=route, method=request.method, status=response.status_code
+    )
+    metrics_service.observe('db_queries_per_request', g.db_query_count, blueprint=blueprint, route=route)
+    metrics_service.observe('db_time_per_request_seconds', g.db_query_time, blueprint=blueprint, route=route)
+
+    metrics_service.maybe_flush()
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    if has_request_context() and 'db_query_count' in g:
+        g.db_query_count += 1
+        g.db_query_time += time.perf_counter() - started
+
+
+def _discard_query_timer(exception_context):
+    # after_cursor_execute does not fire for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
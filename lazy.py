@@ -0,0 +1,47 @@
+import threading
+
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+
+
+def lazy_instance(factory):
+    """
+    Proxy to a singleton that is built by factory() on first use
+
+    Services are module-level globals, but most of them read configuration,
+    register metrics or load fonts and templates when constructed. Behind
+    this proxy that happens when a request or command first touches the
+    service, so importing the app (in the master, or in a worker that never
+    renders a PDF) does not build it. The lock makes concurrent first
+    requests share one instance.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    return LocalProxy(get)
+
+
+_listeners = {}
+
+
+def listen(target, proxy, *identifiers):
+    """
+    Register proxy._<identifier> for each SQLAlchemy event on target
+
+    The listener looks the method up when the event fires, so registering
+    does not build the service. Registering twice is a no-op.
+    """
+    for identifier in identifiers:
+        key = (id(proxy), identifier)
+        if key not in _listeners:
+            method = f'_{identifier}'
+            _listeners[key] = lambda *args, _method=method, **kwargs: getattr(proxy, _method)(*args, **kwargs)
+        if not event.contains(target, identifier, _listeners[key]):
+            event.listen(target, identifier, _listeners[key])
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class LocalStore:
+    """
+    A small SQLite file shared by all gunicorn workers on a host.
+
+    Each process keeps one connection, opened on first use and reopened after
+    fork, and serialises its threads (or greenlets) on a lock, so setup
+    (WAL mode, CREATE TABLE) runs once per worker rather than per thread.
+
+    The sqlite3 calls are not cooperative: under gevent a statement that
+    waits for another worker's write lock blocks the whole worker for up to
+    `timeout` seconds. The files are local and writes are a few rows, so in
+    practice that wait is well under a millisecond.
+    """
+
+    def __init__(self, path: str, schema: str, timeout: float = 1.0):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """The process's connection, held exclusively by the caller"""
+        if self._pid != os.getpid():
+            # A lock held by another thread at fork time would never be released
+            self._lock = threading.Lock()
+            self._conn = None
+            self._pid = os.getpid()
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            yield self._conn
+
+    @contextmanager
+    def transaction(self):
+        """connection() inside BEGIN IMMEDIATE ... COMMIT, rolled back on error"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(self.schema)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
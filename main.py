@@ -1,51 +1,231 @@
 import os
+import click
 from flask import Flask, send_from_directory
-from src.models.user import db, User
-from src.models.appointment import Appointment
-from src.models.prescription import Prescription
-from src.routes.user import user_bp
-from src.routes.appointment import appointment_bp
-from src.routes.prescription import prescription_bp
-from src.routes.auth import auth_bp
-from src.routes.templates import templates_bp
-from src.routes.pdf import pdf_bp
-
-# Create Flask app
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "asdf#FGSgvasgf$5$WGT")
-
-# Database config (SQLite fallback if DATABASE_URL not provided)
-db_path = os.path.join(os.path.dirname(__file__), "database", "app.db")
-os.makedirs(os.path.dirname(db_path), exist_ok=True)  # Ensure folder exists
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", f"sqlite:///{db_path}")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-db.init_app(app)
-
-with app.app_context():
-    db.create_all()
-
-# Register Blueprints
-app.register_blueprint(user_bp, url_prefix="/api/users")
-app.register_blueprint(appointment_bp, url_prefix="/api/appointments")
-app.register_blueprint(prescription_bp, url_prefix="/api/prescriptions")
-app.register_blueprint(auth_bp, url_prefix="/api/auth")
-app.register_blueprint(templates_bp, url_prefix="/api/templates")
-app.register_blueprint(pdf_bp, url_prefix="/api/pdf")
-
-# Default root route
-@app.route("/")
-def index():
-    return {"message": "Flask app is running 🚀"}
-
-# Static file handler
-@app.route("/<path:path>")
-def serve_static(path):
-    if path and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    elif os.path.exists(os.path.join(app.static_folder, "index.html")):
-        return send_from_directory(app.static_folder, "index.html")
-    else:
-        return "File not found", 404
+from src.models.user import db
+from src.db_profile import configure_database, install_engine_hooks
+from src.static_assets import StaticAssetCache
+from src.instrumentation import init_instrumentation
+from src.profiling import request_profiler
+from src.memory_watchdog import memory_watchdog
+
+
+def create_app(config=None):
+    """
+    Build and configure the Flask application.
+
+    Blueprints are imported here rather than at module import time, and the
+    service singletons they reference are lazy proxies (see src.lazy) built
+    on first use, so importing the app does not construct them. Schema setup
+    can be switched off with AUTO_CREATE_SCHEMA so that it runs once (in the
+    gunicorn master with --preload, or via `flask init-db`) instead of in
+    every worker; gunicorn.conf.py sets it accordingly.
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "asdf#FGSgvasgf$5$WGT")
+
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["AUTO_CREATE_SCHEMA"] = os.getenv("AUTO_CREATE_SCHEMA", "1") == "1"
+
+    if config:
+        app.config.update(config)
+
+    # Database config (SQLite fallback if DATABASE_URL not provided)
+    db_path = os.path.join(os.path.dirname(__file__), "database", "app.db")
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)  # Ensure folder exists
+    configure_database(app, f"sqlite:///{db_path}")
+
+    db.init_app(app)
+    install_engine_hooks(app, db)
+    init_instrumentation(app, db)
+    request_profiler.init_app(app)
+    memory_watchdog.init_app(app)
+
+    _register_listeners()
+    _register_blueprints(app)
+    _register_routes(app)
+    _register_commands(app)
+
+    if app.config["AUTO_CREATE_SCHEMA"]:
+        init_schema(app)
+
+    _register_fork_hook(app)
+
+    return app
+
+
+def init_schema(app):
+    """Create any missing tables. Safe to call repeatedly."""
+    # Import models so their tables are registered on the metadata
+    from src.models.appointment import Appointment  # noqa: F401
+    from src.models.prescription import Prescription  # noqa: F401
+    from src.models.user import User  # noqa: F401
+    from src.models.idempotency_key import IdempotencyKey  # noqa: F401
+    from src.models.daily_stats import DailyStats, MedicineStats  # noqa: F401
+    from src.models.archived_appointment import ArchivedAppointment  # noqa: F401
+    from src.models.dispatch_job import DispatchJob  # noqa: F401
+    from src.models.patient_phone import PatientPhone  # noqa: F401
+    from src.models.queue_day import QueueDay  # noqa: F401
+    from src.models.auth_session import AuthSession  # noqa: F401
+
+    from src.services.search_service import appointment_search_service
+
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            appointment_search_service.install(conn)
+
+
+def _register_listeners():
+    from src.db_profile import RoutingSession
+    from src.services import analytics_service, patient_history_service, queue_service, token_cache_service
+
+    # Registering does not build the services; see src.lazy.listen
+    for service_module in (analytics_service, patient_history_service, token_cache_service, queue_service):
+        service_module.register_listeners(RoutingSession)
+
+
+def _register_blueprints(app):
+    from src.routes.user import user_bp
+    from src.routes.appointment import appointment_bp
+    from src.routes.prescription import prescription_bp
+    from src.routes.auth import auth_bp
+    from src.routes.templates import templates_bp
+    from src.routes.pdf import pdf_bp
+    from src.routes.metrics import metrics_bp
+    from src.routes.admin import admin_bp
+    from src.routes.stats import stats_bp
+    from src.routes.export import export_bp
+    from src.routes.consultation import consultation_bp
+
+    app.register_blueprint(user_bp, url_prefix="/api/users")
+    app.register_blueprint(appointment_bp, url_prefix="/api/appointments")
+    app.register_blueprint(prescription_bp, url_prefix="/api/prescriptions")
+    app.register_blueprint(auth_bp, url_prefix="/api/auth")
+    app.register_blueprint(templates_bp, url_prefix="/api/templates")
+    app.register_blueprint(pdf_bp, url_prefix="/api/pdf")
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp, url_prefix="/api/admin")
+    app.register_blueprint(stats_bp, url_prefix="/api/stats")
+    app.register_blueprint(export_bp, url_prefix="/api/export")
+    app.register_blueprint(consultation_bp, url_prefix="/api/consultations")
+
+
+def _register_routes(app):
+    # Default root route
+    @app.route("/")
+    def index():
+        return {"message": "Flask app is running 🚀"}
+
+    # Static files are loaded, hashed and precompressed once; see StaticAssetCache
+    # STATIC_WATCH unset: watch whenever the app runs in debug mode
+    static_watch = app.config.get("STATIC_WATCH", os.getenv("STATIC_WATCH"))
+    if isinstance(static_watch, str):
+        static_watch = static_watch == "1"
+    static_assets = StaticAssetCache(app.static_folder, watch=static_watch).load()
+    app.extensions["static_assets"] = static_assets
+
+    # Static file handler
+    @app.route("/<path:path>")
+    def serve_static(path):
+        asset = static_assets.get(path)
+        if asset is not None:
+            return static_assets.response(asset)
+        elif static_assets.serves_from_disk(path):
+            return send_from_directory(app.static_folder, path)
+
+        # Unknown paths are SPA routes
+        index_asset = static_assets.get("index.html")
+        if index_asset is not None:
+            return static_assets.response(index_asset)
+        else:
+            return "File not found", 404
+
+
+def _register_commands(app):
+    @app.cli.command("init-db")
+    def init_db_command():
+        """Create database tables (run once per deploy when AUTO_CREATE_SCHEMA=0)."""
+        init_schema(app)
+        print("Database schema is up to date")
+
+    @app.cli.command("backfill-stats")
+    def backfill_stats_command():
+        """Rebuild the analytics summary tables from the raw appointment data."""
+        from src.services.analytics_service import analytics_service
+        result = analytics_service.backfill()
+        print(f"Rebuilt stats for {result['days']} days and {result['medicines']} medicines")
+
+    @app.cli.command("backfill-patient-index")
+    @click.option("--rebuild", is_flag=True, help="Re-normalise every appointment, archived ones included (after changing PHONE_DEFAULT_COUNTRY_CODE).")
+    def backfill_patient_index_command(rebuild):
+        """Index the phone numbers of appointments booked before the patient index existed."""
+        from src.services.patient_history_service import patient_history_service
+        print(f"Indexed {patient_history_service.backfill(rebuild)} appointments")
+
+    @app.cli.command("backfill-queue")
+    @click.option("--day", default=None, help="Token day as YYYYMMDD (default: today).")
+    def backfill_queue_command(day):
+        """Recount a day's queue counters from the appointments booked so far."""
+        from datetime import datetime
+        from src.services.queue_service import queue_service
+        day = day or datetime.now().strftime("%Y%m%d")
+        result = queue_service.backfill(day)
+        print(f"{day}: {result['booked']} booked, {result['served']} served")
+
+    @app.cli.command("archive-records")
+    @click.option("--days", type=int, default=None, help="Archive appointments older than this (default ARCHIVE_AFTER_DAYS).")
+    @click.option("--batch-size", type=int, default=500)
+    def archive_records_command(days, batch_size):
+        """Move old appointments and prescriptions to the compressed archive."""
+        from src.services.archive_service import archive_service
+        result = archive_service.archive_old_records(older_than_days=days, batch_size=batch_size)
+        print(f"Archived {result['appointments']} appointments and {result['prescriptions']} prescriptions")
+
+    @app.cli.command("export-records")
+    @click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), default="csv")
+    @click.option("--output", type=click.File("w"), default="-", help="Output file (default: stdout).")
+    @click.option("--since", type=click.DateTime(), default=None)
+    @click.option("--until", type=click.DateTime(), default=None)
+    @click.option("--include-archived/--no-archived", default=True, help="Include appointments in the cold archive (default: yes).")
+    def export_records_command(fmt, output, since, until, include_archived):
+        """Stream appointments and prescriptions to CSV or JSON lines."""
+        from src.services.export_service import export_service
+        export = export_service.iter_csv if fmt == "csv" else export_service.iter_jsonl
+        chunks = export(since, until, include_archived)
+        for chunk in chunks:
+            output.write(chunk)
+
+    @app.cli.command("purge-idempotency-keys")
+    def purge_idempotency_keys_command():
+        """Delete stored Idempotency-Key responses past their TTL."""
+        from src.idempotency import purge_expired
+        print(f"Deleted {purge_expired()} expired idempotency keys")
+
+
+def _register_fork_hook(app):
+    """
+    Drop pooled connections inherited from a preloading parent process.
+
+    With gunicorn --preload the app (and possibly a connection opened by
+    schema setup) is created in the master; sharing those sockets or SQLite
+    handles between forked workers corrupts them. dispose(close=False) makes
+    the child start with a fresh pool without closing the parent's connections.
+    """
+    if not hasattr(os, "register_at_fork"):
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    def _dispose_engines():
+        for engine in engines:
+            engine.dispose(close=False)
+
+    os.register_at_fork(after_in_child=_dispose_engines)
+
+
+# Module-level app for `gunicorn src.main:app` and `flask run`
+app = create_app()
 
 # Run app
 if __name__ == "__main__":
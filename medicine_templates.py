@@ -1,3 +1,5 @@
+from src.lazy import lazy_instance
+
 class MedicineTemplatesService:
     """
     Service for managing medicine templates for common health issues.
@@ -180,5 +182,5 @@ class MedicineTemplatesService:
         
         return results
 
-# Global instance
-medicine_templates_service = MedicineTemplatesService()
+# Global instance, built on first use
+medicine_templates_service = lazy_instance(MedicineTemplatesService)
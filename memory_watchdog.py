@@ -0,0 +1,180 @@
+import glob
+import json
+import os
+import resource
+import signal
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from flask import request
+
+from src.services.metrics_service import metrics_service, pid_alive
+
+
+class MemoryWatchdog:
+    """
+    Per-worker memory sampling and graceful recycling.
+
+    After a request, at most every MEMORY_SAMPLE_SECONDS, the worker records
+    its resident set size (and, when MEMORY_TRACEMALLOC=1, the top allocation
+    sites from tracemalloc) to MEMORY_DIR/<pid>.json, so the admin endpoint
+    can show every worker, not just the one answering.
+
+    If RSS exceeds MEMORY_LIMIT_MB the worker sends itself SIGTERM once the
+    response has been sent. Gunicorn treats that as a graceful shutdown: the
+    worker finishes its in-flight requests, exits and the master starts a
+    fresh one. This only happens under gunicorn; other servers just log.
+    """
+
+    def __init__(self):
+        self.directory = os.getenv('MEMORY_DIR', os.path.join(tempfile.gettempdir(), 'doctorportal-memory'))
+        self.sample_interval = float(os.getenv('MEMORY_SAMPLE_SECONDS', 10))
+        self.limit_bytes = float(os.getenv('MEMORY_LIMIT_MB', 0)) * 1024 * 1024  # 0 = never recycle
+        self.tracemalloc_enabled = os.getenv('MEMORY_TRACEMALLOC', '0') == '1'
+        self.tracemalloc_frames = int(os.getenv('MEMORY_TRACEMALLOC_FRAMES', 1))
+        self.top_allocators = int(os.getenv('MEMORY_TOP_ALLOCATORS', 15))
+
+        self._pid = None
+        self._started_at = None
+        self._requests = 0
+        self._last_sample = 0.0
+        self._recycling = False
+        self._lock = threading.Lock()
+
+        metrics_service.gauge('process_resident_memory_bytes', 'Resident set size of each worker')
+        metrics_service.counter('memory_recycles_total', 'Workers recycled for exceeding MEMORY_LIMIT_MB')
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    def sample(self) -> dict:
+        """Measure this worker now and write its snapshot"""
+        self._check_fork()
+        rss = current_rss()
+        snapshot = {
+            'pid': os.getpid(),
+            'rss_bytes': rss,
+            'peak_rss_bytes': peak_rss(),
+            'limit_bytes': self.limit_bytes or None,
+            'requests': self._requests,
+            'uptime_seconds': round(time.time() - self._started_at),
+            'sampled_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'top_allocators': self._top_allocators(),
+        }
+        metrics_service.set('process_resident_memory_bytes', rss)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(f'{path}.tmp', path)  # atomic, readers never see a partial file
+        return snapshot
+
+    def collect(self) -> list:
+        """Latest snapshot of every live worker, this one freshly sampled"""
+        current = self.sample()
+        workers = [current]
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            pid = int(os.path.basename(path).split('.')[0])
+            if pid == current['pid']:
+                continue
+            if not pid_alive(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    workers.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(workers, key=lambda worker: worker['rss_bytes'], reverse=True)
+
+    def _after_request(self, response):
+        self._check_fork()
+        self._requests += 1
+        if time.monotonic() - self._last_sample < self.sample_interval:
+            return response
+
+        with self._lock:
+            if time.monotonic() - self._last_sample < self.sample_interval:
+                return response
+            self._last_sample = time.monotonic()
+        try:
+            snapshot = self.sample()
+        except OSError as e:
+            print(f"Error writing memory sample: {e}")
+            return response
+
+        if self.limit_bytes and snapshot['rss_bytes'] > self.limit_bytes and not self._recycling:
+            self._recycle(snapshot['rss_bytes'], response)
+        return response
+
+    def _recycle(self, rss, response):
+        print(
+            f"Worker {os.getpid()} RSS {rss / 1048576:.0f} MB exceeds MEMORY_LIMIT_MB "
+            f"({self.limit_bytes / 1048576:.0f} MB)"
+        )
+        if not request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn'):
+            return
+
+        self._recycling = True
+        metrics_service.inc('memory_recycles_total')
+        metrics_service.flush()
+        # Signal after the response is sent; gunicorn then stops accepting
+        # and lets in-flight requests finish (graceful_timeout)
+        response.call_on_close(lambda: os.kill(os.getpid(), signal.SIGTERM))
+
+    def _top_allocators(self):
+        if not self.tracemalloc_enabled:
+            return None
+        if not tracemalloc.is_tracing():
+            return []
+        statistics = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        )).statistics('lineno' if self.tracemalloc_frames == 1 else 'traceback')
+        return [
+            {
+                'location': str(stat.traceback[0]) if self.tracemalloc_frames == 1 else stat.traceback.format(),
+                'size_bytes': stat.size,
+                'count': stat.count
+            }
+            for stat in statistics[:self.top_allocators]
+        ]
+
+    def _check_fork(self):
+        # Tracing and counters start fresh in each worker
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._started_at = time.time()
+            self._requests = 0
+            self._last_sample = 0.0
+            self._recycling = False
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            if self.tracemalloc_enabled:
+                tracemalloc.start(self.tracemalloc_frames)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No procfs (e.g. macOS): the peak is the best available figure
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Largest resident set size this process has had, in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+# Global instance
+memory_watchdog = MemoryWatchdog()
@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from src.services.metrics_service import metrics_service
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus scrape endpoint, aggregated across all workers"""
+    return Response(metrics_service.render_prometheus(), mimetype='text/plain; version=0.0.4')
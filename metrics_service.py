@@ -0,0 +1,248 @@
+import atexit
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Default histogram buckets (seconds) for request/render latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets (bytes) for generated file sizes
+SIZE_BUCKETS = (1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144)
+
+# Buckets for "how many SQL statements did this request run"
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class MetricsService:
+    """
+    Minimal Prometheus-style metrics registry shared by all gunicorn workers.
+
+    Each worker keeps counters, gauges and histograms in memory and
+    periodically writes a snapshot to METRICS_DIR/<pid>.json. A scrape of
+    /metrics merges every worker's snapshot, so the numbers cover the whole
+    server rather than whichever worker answered. Counters and histograms of
+    exited workers are kept (they are cumulative); their gauges are dropped.
+
+    Snapshots are written after a request once the flush interval has passed,
+    by a background thread (a greenlet under gevent) for workers that go
+    idle after a burst, and when the process exits, so a recycled worker's
+    last interval is not lost.
+    """
+
+    def __init__(self):
+        self.directory = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'doctorportal-metrics'))
+        self.flush_interval = float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0))
+        self.definitions = {}  # name: {type, help, buckets}
+        self._values = {}      # (name, labels): number, or [bucket counts..., sum, count] for histograms
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._dirty = False    # values changed since the last flush
+        self._pid = os.getpid()
+        self._flusher_pid = None
+
+        self._define_builtin_metrics()
+        atexit.register(self._flush_at_exit)
+
+    def counter(self, name: str, help_text: str):
+        self.definitions[name] = {'type': 'counter', 'help': help_text}
+
+    def gauge(self, name: str, help_text: str):
+        self.definitions[name] = {'type': 'gauge', 'help': help_text}
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.definitions[name] = {'type': 'histogram', 'help': help_text, 'buckets': tuple(buckets)}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment a counter (or gauge) by value"""
+        key = (name, self._label_key(labels))
+        with self._lock:
+            self._check_fork()
+            self._values[key] = self._values.get(key, 0) + value
+            self._dirty = True
+
+    def set(self, name: str, value: float, **labels):
+        """Set a gauge"""
+        key = (name, self._label_key(labels))
+        with self._lock:
+            self._check_fork()
+            self._values[key] = value
+            self._dirty = True
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation in a histogram"""
+        buckets = self.definitions[name]['buckets']
+        key = (name, self._label_key(labels))
+        with self._lock:
+            self._check_fork()
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(buckets) + [0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+            self._dirty = True
+
+    def maybe_flush(self):
+        """Write this worker's snapshot if the flush interval has passed"""
+        if self._flusher_pid != os.getpid():
+            self._start_flusher()
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write this worker's snapshot to the shared directory"""
+        with self._lock:
+            self._check_fork()
+            snapshot = [[name, dict(labels), value] for (name, labels), value in self._values.items()]
+            self._last_flush = time.monotonic()
+            self._dirty = False
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{self._pid}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)  # atomic, readers never see a partial file
+
+    def reset_directory(self):
+        """Remove snapshots from previous runs (call once, from the gunicorn master)"""
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def collect(self) -> dict:
+        """Merge the snapshots of all workers, including this one"""
+        self.flush()
+
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            pid = int(os.path.basename(path).split('.')[0])
+            alive = pid_alive(pid)
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            for name, labels, value in snapshot:
+                definition = self.definitions.get(name)
+                if definition is None:
+                    continue
+                if definition['type'] == 'gauge':
+                    if not alive:
+                        continue
+                    # Gauges are per worker: keep them apart
+                    labels = {**labels, 'pid': str(pid)}
+                key = (name, self._label_key(labels))
+                if definition['type'] == 'histogram':
+                    current = merged.setdefault(key, [0] * len(value))
+                    merged[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render_prometheus(self) -> str:
+        """Render all workers' metrics in the Prometheus text format (0.0.4)"""
+        merged = self.collect()
+
+        lines = []
+        for name, definition in sorted(self.definitions.items()):
+            series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {definition['help']}")
+            lines.append(f"# TYPE {name} {definition['type']}")
+
+            for labels, value in series:
+                if definition['type'] != 'histogram':
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+                    continue
+
+                # observe() already counts each bucket cumulatively
+                buckets = definition['buckets']
+                for bound, count in zip(buckets, value):
+                    lines.append(f'{name}_bucket{self._format_labels(labels, le=repr(float(bound)))} {count}')
+                lines.append(f'{name}_bucket{self._format_labels(labels, le="+Inf")} {value[-1]}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {value[-2]}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {value[-1]}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _define_builtin_metrics(self):
+        self.histogram('http_request_duration_seconds', 'Request latency by blueprint and route')
+        self.counter('http_requests_total', 'Requests by route and status code')
+        self.histogram('db_queries_per_request', 'SQL statements executed per request', COUNT_BUCKETS)
+        self.histogram('db_time_per_request_seconds', 'Time spent in SQL per request')
+        self.histogram('pdf_render_duration_seconds', 'Prescription PDF render time')
+        self.counter('pdf_render_errors_total', 'Prescription PDF renders that failed')
+        self.histogram('pdf_size_bytes', 'Prescription PDF size by output mode', SIZE_BUCKETS)
+        self.histogram('whatsapp_send_duration_seconds', 'WhatsApp send time by message kind')
+        self.counter('whatsapp_messages_total', 'WhatsApp sends by message kind and result')
+
+    def _start_flusher(self):
+        # Threads do not survive fork(); start one in each worker that records metrics
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_periodically, name='metrics-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        pid = os.getpid()
+        while os.getpid() == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Error writing metrics snapshot: {e}")
+
+    def _flush_at_exit(self):
+        # Only the process that recorded the values writes them
+        if self._dirty and self._pid == os.getpid():
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _check_fork(self):
+        # A forked child inherits the parent's numbers; start it from zero so
+        # the parent's snapshot is not counted twice
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._values = {}
+            self._last_flush = 0.0
+            self._dirty = False
+
+    @staticmethod
+    def _label_key(labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    @staticmethod
+    def _format_labels(labels, **extra):
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ''
+        escaped = (
+            '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for k, v in pairs
+        )
+        return '{' + ','.join(escaped) + '}'
+
+
+def pid_alive(pid) -> bool:
+    """True if a process with this pid exists (e.g. a worker that wrote a snapshot file)"""
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+# Global instance
+metrics_service = MetricsService()
@@ -0,0 +1,248 @@
+import os
+import re
+import sqlite3
+
+from sqlalchemy import delete, insert, select
+
+from src.cache import MISS, InvalidationLog, TTLCache
+from src.flush_changes import prescribed_appointments
+from src.lazy import lazy_instance, listen
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+from src.models.patient_phone import PatientPhone
+from src.models.archived_appointment import ArchivedAppointment
+from src.services.archive_service import archive_service
+from src.services.metrics_service import metrics_service
+
+
+def normalize_phone(phone: str, default_country_code: str = '91'):
+    """
+    Normalise a phone number to E.164 (+<country code><number>)
+
+    Numbers without an international prefix get default_country_code, after
+    dropping a national trunk '0'. Returns None if the result cannot be a
+    valid E.164 number.
+    """
+    if not phone:
+        return None
+    phone = phone.strip()
+    digits = re.sub(r'\D', '', phone)
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    else:
+        digits = default_country_code + digits.lstrip('0')
+
+    if not 8 <= len(digits) <= 15 or digits.startswith('0'):
+        return None
+    return f'+{digits}'
+
+
+metrics_service.counter('patient_history_cache_total', 'Patient history lookups by cache result')
+
+
+class PatientHistoryService:
+    """
+    Earlier visits of a patient, looked up by normalised phone number.
+
+    PatientPhone holds the E.164 form of every appointment's phone with an
+    index on (phone_e164, appointment_id); rows are written from a session
+    after_flush hook in the same transaction as the appointment, and kept
+    when the appointment is archived, so older visits are read back from the
+    cold archive once the hot ones are listed. Numbers without an
+    international prefix are taken to be PHONE_DEFAULT_COUNTRY_CODE (India,
+    91, by default); after changing it, run backfill-patient-index --rebuild.
+    Results are
+    kept in a bounded per-worker cache. When the phone books again or one of
+    its appointments gets a prescription, the number is published to a
+    shared InvalidationLog after commit and every worker drops its entry
+    before the next lookup; if the log cannot be read the cache is bypassed.
+    """
+
+    def __init__(self):
+        self.default_country_code = os.getenv('PHONE_DEFAULT_COUNTRY_CODE', '91')
+        self.max_visits = int(os.getenv('PATIENT_HISTORY_LIMIT', 50))
+        ttl = float(os.getenv('PATIENT_HISTORY_CACHE_TTL', 60))
+        self.cache = TTLCache(max_entries=int(os.getenv('PATIENT_HISTORY_CACHE_SIZE', 1024)), ttl=ttl)
+        self.invalidations = InvalidationLog('patient_history', retention=ttl)
+
+    def normalize(self, phone: str):
+        return normalize_phone(phone, self.default_country_code)
+
+    def get_history(self, phone: str):
+        """
+        Appointments booked from a phone number, newest first
+
+        Args:
+            phone: Phone number in any common format
+
+        Returns:
+            dict or None: the normalised phone and its visits, None if the number is invalid
+        """
+        phone_e164 = self.normalize(phone)
+        if phone_e164 is None:
+            return None
+
+        cached = self._sync()
+        history = self.cache.get(phone_e164) if cached else MISS
+        if history is not MISS:
+            metrics_service.inc('patient_history_cache_total', result='hit')
+            return history
+        metrics_service.inc('patient_history_cache_total', result='miss' if cached else 'bypass')
+
+        appointments = (
+            Appointment.query
+            .join(PatientPhone, PatientPhone.appointment_id == Appointment.id)
+            .filter(PatientPhone.phone_e164 == phone_e164)
+            .order_by(Appointment.timestamp.desc())
+            .limit(self.max_visits)
+            .all()
+        )
+        prescriptions = {}
+        if appointments:
+            for prescription in Prescription.query.filter(
+                Prescription.appointment_id.in_([appointment.id for appointment in appointments])
+            ).order_by(Prescription.id):
+                prescriptions.setdefault(prescription.appointment_id, []).append(prescription.to_dict())
+
+        visits = [
+            {
+                'id': appointment.id,
+                'token': appointment.token,
+                'name': appointment.name,
+                'issue': appointment.issue,
+                'timestamp': appointment.timestamp.isoformat() if appointment.timestamp else None,
+                'prescriptions': prescriptions.get(appointment.id, []),
+                'archived': False
+            }
+            for appointment in appointments
+        ]
+        # Archived visits are older than every hot one
+        if len(visits) < self.max_visits:
+            visits.extend(self._archived_visits(phone_e164, self.max_visits - len(visits)))
+
+        history = {'phone': phone_e164, 'visits': visits}
+        if cached:
+            self.cache.set(phone_e164, history)
+        return history
+
+    def backfill(self, rebuild: bool = False) -> int:
+        """
+        Index appointments that have no PatientPhone row yet
+
+        Args:
+            rebuild: Recompute every row instead, from the hot table and the
+                cold archive (after changing PHONE_DEFAULT_COUNTRY_CODE, or
+                for appointments archived while archiving dropped their rows)
+        """
+        if rebuild:
+            db.session.execute(delete(PatientPhone))
+            phones = db.session.execute(select(Appointment.id, Appointment.phone)).all()
+            phones.extend((record['id'], record['phone']) for record in archive_service.iter_records())
+        else:
+            phones = db.session.execute(
+                select(Appointment.id, Appointment.phone)
+                .outerjoin(PatientPhone, PatientPhone.appointment_id == Appointment.id)
+                .where(PatientPhone.appointment_id.is_(None))
+            ).all()
+        rows = [
+            {'appointment_id': appointment_id, 'phone_e164': phone_e164}
+            for appointment_id, phone in phones
+            if (phone_e164 := self.normalize(phone)) is not None
+        ]
+        if rows:
+            db.session.execute(insert(PatientPhone), rows)
+        db.session.commit()
+        self.cache.clear()
+        return len(rows)
+
+    def _archived_visits(self, phone_e164, limit):
+        entries = (
+            ArchivedAppointment.query
+            .join(PatientPhone, PatientPhone.appointment_id == ArchivedAppointment.appointment_id)
+            .filter(PatientPhone.phone_e164 == phone_e164)
+            .order_by(ArchivedAppointment.booked_at.desc())
+            .limit(limit)
+            .all()
+        )
+        if not entries:
+            return []
+
+        records = archive_service.read_entries(entries)
+        return [
+            {
+                'id': record['id'],
+                'token': record['token'],
+                'name': record['name'],
+                'issue': record['issue'],
+                'timestamp': record['timestamp'],
+                'prescriptions': record['prescriptions'],
+                'archived': True
+            }
+            for entry in entries
+            if (record := records.get(entry.token)) is not None
+        ]
+
+    def _after_flush(self, session, flush_context):
+        rows = []
+        changed = set()
+
+        for obj in session.new:
+            if isinstance(obj, Appointment):
+                phone_e164 = self.normalize(obj.phone)
+                if phone_e164 is not None:
+                    rows.append({'appointment_id': obj.id, 'phone_e164': phone_e164})
+                    changed.add(phone_e164)
+
+        if rows:
+            session.connection().execute(insert(PatientPhone), rows)
+        for appointment in prescribed_appointments(session, flush_context).values():
+            changed.add(self.normalize(appointment['phone']))
+        changed.discard(None)
+
+        if not changed:
+            return
+
+        # Invalidate once the transaction is committed, not before (dropped
+        # if it is rolled back)
+        session.info.setdefault('patient_history_changed', set()).update(changed)
+
+    def _sync(self):
+        """Apply invalidations published by any worker; False if the log is unavailable"""
+        try:
+            changed = self.invalidations.changes()
+        except sqlite3.Error as e:
+            print(f"Patient history invalidation log error: {e}")
+            self.cache.clear()
+            return False
+
+        if changed is None:
+            self.cache.clear()
+        else:
+            for phone_e164 in changed:
+                self.cache.invalidate(phone_e164)
+        return True
+
+    def _after_commit(self, session):
+        changed = session.info.pop('patient_history_changed', None)
+        if not changed:
+            return
+        for phone_e164 in changed:
+            self.cache.invalidate(phone_e164)
+        try:
+            self.invalidations.publish(changed)
+        except sqlite3.Error as e:
+            # Other workers catch up when their entries expire
+            print(f"Patient history invalidation log error: {e}")
+
+    def _after_rollback(self, session):
+        session.info.pop('patient_history_changed', None)
+
+def register_listeners(session_class):
+    """Maintain the phone index and invalidate the cache for sessions of the given class"""
+    listen(session_class, patient_history_service, 'after_flush', 'after_commit', 'after_rollback')
+
+# Global instance, built on first use
+patient_history_service = lazy_instance(PatientHistoryService)
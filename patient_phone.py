@@ -0,0 +1,13 @@
+from src.models.user import db
+
+class PatientPhone(db.Model):
+    """Normalised phone number of each appointment, for patient history lookups"""
+    appointment_id = db.Column(db.Integer, primary_key=True)
+    phone_e164 = db.Column(db.String(16), nullable=False)  # e.g. +15551234567
+
+    __table_args__ = (
+        db.Index('ix_patient_phone_e164_appointment', 'phone_e164', 'appointment_id'),
+    )
+
+    def __repr__(self):
+        return f'<PatientPhone {self.phone_e164}>'
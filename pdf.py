@@ -2,26 +2,26 @@ from flask import Blueprint, jsonify, request, send_file
 from src.models.appointment import Appointment
 from src.models.prescription import Prescription
 from src.services.pdf_service import pdf_service
+from src.services.archive_service import archive_service
+from src.db_profile import read_only
+from src.admission import write_slot
+from src.idempotency import idempotent
 import os
 from datetime import datetime
 
 pdf_bp = Blueprint('pdf', __name__)
 
-@pdf_bp.route('/prescription/<token>/pdf', methods=['GET'])
-def generate_prescription_pdf(token):
-    """Generate and download PDF prescription for a given token"""
-    try:
-        # Find the appointment
-        appointment = Appointment.query.filter_by(token=token).first()
-        if not appointment:
-            return jsonify({'error': 'Appointment not found'}), 404
-        
-        # Get prescriptions for this appointment
-        prescriptions = Prescription.query.filter_by(appointment_id=appointment.id).all()
-        if not prescriptions:
-            return jsonify({'error': 'No prescriptions found for this appointment'}), 404
-        
-        # Prepare appointment data
+def _load_prescription_data(token):
+    """
+    Load appointment and prescription data for a token, falling back to the
+    archive for appointments that have been moved out of the hot tables
+    
+    Returns:
+        tuple: (appointment_data, prescriptions_data, error_response)
+    """
+    # Find the appointment
+    appointment = Appointment.query.filter_by(token=token).first()
+    if appointment:
         appointment_data = {
             'name': appointment.name,
             'phone': appointment.phone,
@@ -29,15 +29,45 @@ def generate_prescription_pdf(token):
             'token': appointment.token,
             'timestamp': appointment.timestamp
         }
-        
-        # Prepare prescriptions data
-        prescriptions_data = []
-        for prescription in prescriptions:
-            prescriptions_data.append({
-                'medicine': prescription.medicine,
-                'dosage': prescription.dosage,
-                'duration': prescription.duration
-            })
+        prescriptions = [
+            prescription.to_dict()
+            for prescription in Prescription.query.filter_by(appointment_id=appointment.id).all()
+        ]
+    else:
+        archived = archive_service.find_by_token(token)
+        if not archived:
+            return None, None, (jsonify({'error': 'Appointment not found'}), 404)
+        appointment_data = {
+            'name': archived['name'],
+            'phone': archived['phone'],
+            'issue': archived['issue'],
+            'token': archived['token'],
+            'timestamp': datetime.fromisoformat(archived['timestamp']) if archived['timestamp'] else None
+        }
+        prescriptions = archived['prescriptions']
+    
+    if not prescriptions:
+        return None, None, (jsonify({'error': 'No prescriptions found for this appointment'}), 404)
+    
+    # Prepare prescriptions data
+    prescriptions_data = []
+    for prescription in prescriptions:
+        prescriptions_data.append({
+            'medicine': prescription['medicine'],
+            'dosage': prescription['dosage'],
+            'duration': prescription['duration']
+        })
+    
+    return appointment_data, prescriptions_data, None
+
+@pdf_bp.route('/prescription/<token>/pdf', methods=['GET'])
+@read_only
+def generate_prescription_pdf(token):
+    """Generate and download PDF prescription for a given token"""
+    try:
+        appointment_data, prescriptions_data, error = _load_prescription_data(token)
+        if error:
+            return error
         
         # Generate PDF in memory
         pdf_buffer = pdf_service.generate_prescription_buffer(appointment_data, prescriptions_data)
@@ -56,36 +86,15 @@ def generate_prescription_pdf(token):
         return jsonify({'error': str(e)}), 500
 
 @pdf_bp.route('/prescription/<token>/pdf/generate', methods=['POST'])
+@idempotent
+@write_slot
+@read_only
 def create_prescription_pdf_file(token):
     """Generate PDF file and return file path for WhatsApp sending"""
     try:
-        # Find the appointment
-        appointment = Appointment.query.filter_by(token=token).first()
-        if not appointment:
-            return jsonify({'error': 'Appointment not found'}), 404
-        
-        # Get prescriptions for this appointment
-        prescriptions = Prescription.query.filter_by(appointment_id=appointment.id).all()
-        if not prescriptions:
-            return jsonify({'error': 'No prescriptions found for this appointment'}), 404
-        
-        # Prepare appointment data
-        appointment_data = {
-            'name': appointment.name,
-            'phone': appointment.phone,
-            'issue': appointment.issue,
-            'token': appointment.token,
-            'timestamp': appointment.timestamp
-        }
-        
-        # Prepare prescriptions data
-        prescriptions_data = []
-        for prescription in prescriptions:
-            prescriptions_data.append({
-                'medicine': prescription.medicine,
-                'dosage': prescription.dosage,
-                'duration': prescription.duration
-            })
+        appointment_data, prescriptions_data, error = _load_prescription_data(token)
+        if error:
+            return error
         
         # Create output directory if it doesn't exist
         output_dir = os.path.join(os.path.dirname(__file__), '..', 'static', 'prescriptions')
@@ -95,7 +104,8 @@ def create_prescription_pdf_file(token):
         filename = f"prescription_{token}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         output_path = os.path.join(output_dir, filename)
         
-        pdf_service.generate_prescription_pdf(appointment_data, prescriptions_data, output_path)
+        # Compact output: this file is sent over WhatsApp
+        pdf_service.generate_prescription_pdf(appointment_data, prescriptions_data, output_path, compact=True)
         
         return jsonify({
             'success': True,
@@ -1,7 +1,10 @@
-from fpdf import FPDF
 from datetime import datetime
 import os
 import io
+import time
+from src.concurrency import OffloadPool
+from src.lazy import lazy_instance
+from src.services.metrics_service import metrics_service
 
 class PDFPrescriptionService:
     """
@@ -9,6 +12,12 @@ class PDFPrescriptionService:
     """
     
     def __init__(self):
+        # 'compact' produces smaller files for WhatsApp delivery, see render_prescription
+        self.compact = os.getenv('PDF_OUTPUT_MODE', 'standard') == 'compact'
+        # Add title/author/language metadata (not a full PDF/A conformance claim)
+        self.pdfa_lite = os.getenv('PDF_A_LITE', '0') == '1'
+        # Rendering is CPU-bound; see OffloadPool for the modes
+        self.pool = OffloadPool(os.getenv('PDF_RENDER_POOL', 'auto'), int(os.getenv('PDF_RENDER_PROCESSES', 1)))
         self.doctor_info = {
             'name': 'Dr. Sarah Johnson',
             'qualification': 'MBBS, MD (Internal Medicine)',
@@ -20,7 +29,7 @@ class PDFPrescriptionService:
             'email': 'dr.sarah@medicare-clinic.com'
         }
     
-    def generate_prescription_pdf(self, appointment_data, prescriptions, output_path):
+    def generate_prescription_pdf(self, appointment_data, prescriptions, output_path, compact=None):
         """
         Generate a professional PDF prescription
         
@@ -28,182 +37,225 @@ class PDFPrescriptionService:
             appointment_data: Dictionary containing patient and appointment information
             prescriptions: List of prescription dictionaries
             output_path: Path where the PDF will be saved
+            compact: Use the compact output mode (defaults to PDF_OUTPUT_MODE)
             
         Returns:
             str: Path to the generated PDF file
         """
-        try:
-            # Create PDF instance
-            pdf = FPDF()
-            pdf.add_page()
-            pdf.set_auto_page_break(auto=True, margin=15)
-            
-            # Header with clinic information
-            pdf.set_font('Arial', 'B', 20)
-            pdf.set_text_color(44, 62, 80)  # Dark blue
-            pdf.cell(0, 15, self.doctor_info['clinic_name'], 0, 1, 'C')
-            
-            pdf.set_font('Arial', '', 12)
-            pdf.set_text_color(0, 0, 0)
-            pdf.cell(0, 8, self.doctor_info['address'], 0, 1, 'C')
-            pdf.cell(0, 8, self.doctor_info['city'], 0, 1, 'C')
-            pdf.cell(0, 8, f"Phone: {self.doctor_info['phone']} | Email: {self.doctor_info['email']}", 0, 1, 'C')
-            
-            # Horizontal line
-            pdf.ln(10)
-            pdf.set_draw_color(52, 152, 219)  # Blue
-            pdf.line(20, pdf.get_y(), 190, pdf.get_y())
-            pdf.ln(10)
-            
-            # Doctor information
-            pdf.set_font('Arial', 'B', 14)
-            pdf.cell(0, 8, self.doctor_info['name'], 0, 1)
-            pdf.set_font('Arial', '', 11)
-            pdf.cell(0, 6, self.doctor_info['qualification'], 0, 1)
-            pdf.cell(0, 6, f"Registration No: {self.doctor_info['registration_number']}", 0, 1)
-            pdf.ln(10)
-            
-            # Prescription title
-            pdf.set_font('Arial', 'B', 24)
-            pdf.set_text_color(44, 62, 80)
-            pdf.cell(0, 15, 'MEDICAL PRESCRIPTION', 0, 1, 'C')
-            pdf.set_text_color(0, 0, 0)
-            pdf.ln(10)
-            
-            # Patient information
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(50, 8, 'Patient Name:', 0, 0)
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(70, 8, appointment_data['name'], 0, 0)
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(30, 8, 'Date:', 0, 0)
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(0, 8, datetime.now().strftime('%B %d, %Y'), 0, 1)
-            
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(50, 8, 'Phone:', 0, 0)
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(70, 8, appointment_data['phone'], 0, 0)
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(30, 8, 'Token No:', 0, 0)
-            pdf.set_font('Arial', '', 12)
-            pdf.cell(0, 8, appointment_data['token'], 0, 1)
-            
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(50, 8, 'Chief Complaint:', 0, 0)
-            pdf.set_font('Arial', '', 12)
-            pdf.multi_cell(0, 8, appointment_data['issue'])
-            pdf.ln(5)
-            
-            # Prescription section
-            pdf.set_font('Arial', 'B', 16)
-            pdf.cell(0, 12, 'PRESCRIPTION', 0, 1)
-            pdf.ln(5)
-            
-            # Table header
-            pdf.set_font('Arial', 'B', 11)
-            pdf.set_fill_color(52, 152, 219)  # Blue background
-            pdf.set_text_color(255, 255, 255)  # White text
-            pdf.cell(15, 10, 'S.No.', 1, 0, 'C', True)
-            pdf.cell(60, 10, 'Medicine Name', 1, 0, 'C', True)
-            pdf.cell(60, 10, 'Dosage Instructions', 1, 0, 'C', True)
-            pdf.cell(35, 10, 'Duration', 1, 1, 'C', True)
-            
-            # Table content
-            pdf.set_font('Arial', '', 10)
-            pdf.set_text_color(0, 0, 0)
-            pdf.set_fill_color(248, 249, 250)  # Light gray
-            
-            for i, prescription in enumerate(prescriptions, 1):
-                fill = i % 2 == 0  # Alternate row colors
-                pdf.cell(15, 10, str(i), 1, 0, 'C', fill)
-                pdf.cell(60, 10, prescription['medicine'][:25], 1, 0, 'L', fill)
-                pdf.cell(60, 10, prescription['dosage'][:25], 1, 0, 'L', fill)
-                pdf.cell(35, 10, prescription['duration'][:15], 1, 1, 'L', fill)
-            
-            pdf.ln(15)
-            
-            # Instructions
-            pdf.set_font('Arial', 'B', 12)
-            pdf.cell(0, 8, 'General Instructions:', 0, 1)
-            pdf.set_font('Arial', '', 10)
-            instructions = [
-                '• Take medicines as prescribed by the doctor',
-                '• Complete the full course of medication',
-                '• Consult the doctor if any adverse reactions occur',
-                '• Follow up as advised'
-            ]
-            for instruction in instructions:
-                pdf.cell(0, 6, instruction, 0, 1)
-            
-            pdf.ln(20)
-            
-            # Doctor signature section
-            pdf.set_font('Arial', 'B', 11)
-            pdf.cell(100, 8, '', 0, 0)  # Empty space
-            pdf.cell(70, 8, "Doctor's Signature", 0, 1, 'C')
-            pdf.ln(15)
-            pdf.cell(100, 8, '', 0, 0)  # Empty space
-            pdf.line(120, pdf.get_y(), 180, pdf.get_y())  # Signature line
-            pdf.ln(8)
-            pdf.set_font('Arial', '', 10)
-            pdf.cell(100, 6, '', 0, 0)  # Empty space
-            pdf.cell(70, 6, f"Dr. {self.doctor_info['name']}", 0, 1, 'C')
-            pdf.cell(100, 6, '', 0, 0)  # Empty space
-            pdf.cell(70, 6, self.doctor_info['qualification'], 0, 1, 'C')
-            
-            pdf.ln(10)
-            
-            # Footer
-            pdf.set_font('Arial', '', 8)
-            pdf.set_text_color(128, 128, 128)
-            pdf.cell(0, 6, 'This prescription is generated electronically and is valid for medical purposes.', 0, 1, 'C')
-            pdf.cell(0, 6, f"For any queries, please contact {self.doctor_info['phone']} or {self.doctor_info['email']}", 0, 1, 'C')
-            
-            # Save PDF
-            pdf.output(output_path)
-            
-            return output_path
+        pdf_bytes = self.render_prescription(appointment_data, prescriptions, compact=compact)
+        with open(output_path, 'wb') as f:
+            f.write(pdf_bytes)
+        return output_path
+    
+    def render_prescription(self, appointment_data, prescriptions, compact=None):
+        """
+        Render a prescription PDF to bytes
+        
+        Compact mode tightens vertical spacing so a typical prescription fits
+        on one page, uses shorter table rows and drops the zebra striping
+        (which makes fpdf wrap every table cell in its own graphics state to
+        restore the text colour). Both modes use the standard PDF core fonts,
+        so no font data is embedded, and compress page streams.
+        
+        Args:
+            appointment_data: Dictionary containing patient and appointment information
+            prescriptions: List of prescription dictionaries
+            compact: Use the compact output mode (defaults to PDF_OUTPUT_MODE)
             
+        Returns:
+            bytes: The PDF document
+        """
+        if compact is None:
+            compact = self.compact
+
+        started = time.perf_counter()
+        try:
+            pdf_bytes = self.pool.run(_render_pdf, appointment_data, prescriptions, compact)
         except Exception as e:
+            metrics_service.inc('pdf_render_errors_total')
             raise Exception(f"Error generating PDF: {str(e)}")
+
+        metrics_service.observe('pdf_render_duration_seconds', time.perf_counter() - started)
+        metrics_service.observe('pdf_size_bytes', len(pdf_bytes), mode='compact' if compact else 'standard')
+        return pdf_bytes
     
-    def generate_prescription_buffer(self, appointment_data, prescriptions):
+    def _build(self, appointment_data, prescriptions, compact):
+        """Lay out the prescription; runs wherever self.pool puts it"""
+        # fpdf is imported on first render so workers that never produce a PDF
+        # do not pay for loading it at boot
+        from fpdf import FPDF
+
+        gap = 0.4 if compact else 1  # scale for vertical spacing
+        row_height = 7 if compact else 10
+
+        # Create PDF instance
+        pdf = FPDF()
+        # Core fonts use WinAnsiEncoding; the default latin-1 cannot encode the bullets below
+        pdf.core_fonts_encoding = 'windows-1252'
+        if self.pdfa_lite:
+            self._set_document_metadata(pdf, appointment_data)
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        
+        # Header with clinic information
+        pdf.set_font('Arial', 'B', 20)
+        pdf.set_text_color(44, 62, 80)  # Dark blue
+        pdf.cell(0, 15, self.doctor_info['clinic_name'], 0, 1, 'C')
+        
+        pdf.set_font('Arial', '', 12)
+        pdf.set_text_color(0, 0, 0)
+        pdf.cell(0, 8, self.doctor_info['address'], 0, 1, 'C')
+        pdf.cell(0, 8, self.doctor_info['city'], 0, 1, 'C')
+        pdf.cell(0, 8, f"Phone: {self.doctor_info['phone']} | Email: {self.doctor_info['email']}", 0, 1, 'C')
+        
+        # Horizontal line
+        pdf.ln(10 * gap)
+        pdf.set_draw_color(52, 152, 219)  # Blue
+        pdf.line(20, pdf.get_y(), 190, pdf.get_y())
+        pdf.ln(10 * gap)
+        
+        # Doctor information
+        pdf.set_font('Arial', 'B', 14)
+        pdf.cell(0, 8, self.doctor_info['name'], 0, 1)
+        pdf.set_font('Arial', '', 11)
+        pdf.cell(0, 6, self.doctor_info['qualification'], 0, 1)
+        pdf.cell(0, 6, f"Registration No: {self.doctor_info['registration_number']}", 0, 1)
+        pdf.ln(10 * gap)
+        
+        # Prescription title
+        pdf.set_font('Arial', 'B', 24)
+        pdf.set_text_color(44, 62, 80)
+        pdf.cell(0, 15, 'MEDICAL PRESCRIPTION', 0, 1, 'C')
+        pdf.set_text_color(0, 0, 0)
+        pdf.ln(10 * gap)
+        
+        # Patient information
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(50, 8, 'Patient Name:', 0, 0)
+        pdf.set_font('Arial', '', 12)
+        pdf.cell(70, 8, appointment_data['name'], 0, 0)
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(30, 8, 'Date:', 0, 0)
+        pdf.set_font('Arial', '', 12)
+        pdf.cell(0, 8, datetime.now().strftime('%B %d, %Y'), 0, 1)
+        
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(50, 8, 'Phone:', 0, 0)
+        pdf.set_font('Arial', '', 12)
+        pdf.cell(70, 8, appointment_data['phone'], 0, 0)
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(30, 8, 'Token No:', 0, 0)
+        pdf.set_font('Arial', '', 12)
+        pdf.cell(0, 8, appointment_data['token'], 0, 1)
+        
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(50, 8, 'Chief Complaint:', 0, 0)
+        pdf.set_font('Arial', '', 12)
+        pdf.multi_cell(0, 8, appointment_data['issue'])
+        pdf.ln(5 * gap)
+        
+        # Prescription section
+        pdf.set_font('Arial', 'B', 16)
+        pdf.cell(0, 12, 'PRESCRIPTION', 0, 1)
+        pdf.ln(5 * gap)
+        
+        # Table header
+        pdf.set_font('Arial', 'B', 11)
+        pdf.set_fill_color(52, 152, 219)  # Blue background
+        pdf.set_text_color(255, 255, 255)  # White text
+        pdf.cell(15, 10, 'S.No.', 1, 0, 'C', True)
+        pdf.cell(60, 10, 'Medicine Name', 1, 0, 'C', True)
+        pdf.cell(60, 10, 'Dosage Instructions', 1, 0, 'C', True)
+        pdf.cell(35, 10, 'Duration', 1, 1, 'C', True)
+        
+        # Table content
+        pdf.set_font('Arial', '', 10)
+        pdf.set_text_color(0, 0, 0)
+        if compact:
+            pdf.set_fill_color(0, 0, 0)  # Same as text colour, no per-cell colour switching
+        else:
+            pdf.set_fill_color(248, 249, 250)  # Light gray
+        
+        for i, prescription in enumerate(prescriptions, 1):
+            fill = i % 2 == 0 and not compact  # Alternate row colors
+            pdf.cell(15, row_height, str(i), 1, 0, 'C', fill)
+            pdf.cell(60, row_height, prescription['medicine'][:25], 1, 0, 'L', fill)
+            pdf.cell(60, row_height, prescription['dosage'][:25], 1, 0, 'L', fill)
+            pdf.cell(35, row_height, prescription['duration'][:15], 1, 1, 'L', fill)
+        
+        pdf.ln(15 * gap)
+        
+        # Instructions
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 8, 'General Instructions:', 0, 1)
+        pdf.set_font('Arial', '', 10)
+        instructions = [
+            '• Take medicines as prescribed by the doctor',
+            '• Complete the full course of medication',
+            '• Consult the doctor if any adverse reactions occur',
+            '• Follow up as advised'
+        ]
+        for instruction in instructions:
+            pdf.cell(0, 6, instruction, 0, 1)
+        
+        pdf.ln(20 * gap)
+        
+        # Doctor signature section
+        pdf.set_font('Arial', 'B', 11)
+        pdf.cell(100, 8, '', 0, 0)  # Empty space
+        pdf.cell(70, 8, "Doctor's Signature", 0, 1, 'C')
+        pdf.ln(15 * gap)
+        pdf.cell(100, 8, '', 0, 0)  # Empty space
+        pdf.line(120, pdf.get_y(), 180, pdf.get_y())  # Signature line
+        pdf.ln(8 * gap)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(100, 6, '', 0, 0)  # Empty space
+        pdf.cell(70, 6, f"Dr. {self.doctor_info['name']}", 0, 1, 'C')
+        pdf.cell(100, 6, '', 0, 0)  # Empty space
+        pdf.cell(70, 6, self.doctor_info['qualification'], 0, 1, 'C')
+        
+        pdf.ln(10 * gap)
+        
+        # Footer
+        pdf.set_font('Arial', '', 8)
+        pdf.set_text_color(128, 128, 128)
+        pdf.cell(0, 6, 'This prescription is generated electronically and is valid for medical purposes.', 0, 1, 'C')
+        pdf.cell(0, 6, f"For any queries, please contact {self.doctor_info['phone']} or {self.doctor_info['email']}", 0, 1, 'C')
+        
+        return bytes(pdf.output())
+    
+    def generate_prescription_buffer(self, appointment_data, prescriptions, compact=None):
         """
         Generate PDF prescription in memory buffer
         
         Args:
             appointment_data: Dictionary containing patient and appointment information
             prescriptions: List of prescription dictionaries
+            compact: Use the compact output mode (defaults to PDF_OUTPUT_MODE)
             
         Returns:
             io.BytesIO: PDF content as bytes buffer
         """
-        buffer = io.BytesIO()
-        
-        # Create temporary file path
-        temp_path = f"/tmp/prescription_{appointment_data['token']}.pdf"
-        
-        try:
-            # Generate PDF to temporary file
-            self.generate_prescription_pdf(appointment_data, prescriptions, temp_path)
-            
-            # Read file content into buffer
-            with open(temp_path, 'rb') as f:
-                buffer.write(f.read())
-            
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            
-            buffer.seek(0)
-            return buffer
-            
-        except Exception as e:
-            # Clean up temporary file in case of error
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise e
+        return io.BytesIO(self.render_prescription(appointment_data, prescriptions, compact=compact))
+    
+    def _set_document_metadata(self, pdf, appointment_data):
+        """Title, author, language and XMP metadata for archiving and screen readers"""
+        title = f"Prescription {appointment_data['token']}"
+        pdf.set_title(title)
+        pdf.set_author(self.doctor_info['name'])
+        pdf.set_subject(f"Medical prescription from {self.doctor_info['clinic_name']}")
+        pdf.set_creator(self.doctor_info['clinic_name'])
+        pdf.set_lang('en')
+        pdf.set_xmp_metadata(
+            '<rdf:Description rdf:about="" xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:title><rdf:Alt><rdf:li xml:lang="x-default">{title}</rdf:li></rdf:Alt></dc:title>'
+            '</rdf:Description>'
+        )
+
+
+def _render_pdf(appointment_data, prescriptions, compact):
+    # Module-level so a process pool can pickle it; uses that process's own instance
+    return pdf_service._build(appointment_data, prescriptions, compact)
 
-# Global instance
-pdf_service = PDFPrescriptionService()
+# Global instance, built on first use
+pdf_service = lazy_instance(PDFPrescriptionService)
@@ -0,0 +1,141 @@
+import cProfile
+import glob
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+from flask import g, request
+
+from src.services.auth_service import auth_service
+from src.services.metrics_service import metrics_service
+
+
+class RequestProfiler:
+    """
+    On-demand cProfile capture around Flask requests.
+
+    A request is profiled when any of these hold:
+      * it sends `X-Profile: 1` together with an admin `X-Session-Token`
+      * it is picked by PROFILE_SAMPLE_RATE (fraction of all requests, 0 = off)
+      * an earlier request to the same route took longer than
+        PROFILE_SLOW_MS, which arms one capture of the next request there
+
+    Captures are written as pstats files (readable by pstats, snakeviz,
+    flameprof or gprof2dot) to PROFILE_DIR, keeping at most PROFILE_MAX_FILES.
+    Only one request per worker is profiled at a time.
+    """
+
+    def __init__(self):
+        self.directory = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'doctorportal-profiles'))
+        self.max_files = int(os.getenv('PROFILE_MAX_FILES', 50))
+        self.sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.slow_threshold = float(os.getenv('PROFILE_SLOW_MS', 0)) / 1000
+        # Minimum gap between slow-request captures of the same route
+        self.slow_cooldown = float(os.getenv('PROFILE_SLOW_COOLDOWN', 300))
+
+        self._armed_routes = set()
+        self._last_slow_capture = {}  # route: monotonic time
+        self._busy = threading.Lock()
+
+        metrics_service.counter('profiles_captured_total', 'Request profiles written, by trigger')
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+    def list_captures(self):
+        captures = []
+        for path in sorted(glob.glob(os.path.join(self.directory, '*.prof')), key=os.path.getmtime, reverse=True):
+            captures.append({
+                'filename': os.path.basename(path),
+                'size': os.path.getsize(path),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(os.path.getmtime(path)))
+            })
+        return captures
+
+    def _route(self):
+        return request.url_rule.rule if request.url_rule else 'unmatched'
+
+    def _trigger(self):
+        if request.headers.get('X-Profile') == '1' and auth_service.is_admin(request.headers.get('X-Session-Token', '')):
+            return 'header'
+        if self._route() in self._armed_routes:
+            return 'slow'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def _start(self):
+        g.profile_started = time.perf_counter()
+
+        trigger = self._trigger()
+        if trigger is None or not self._busy.acquire(blocking=False):
+            return
+
+        self._armed_routes.discard(self._route())
+        profiler = cProfile.Profile()
+        g.profiler = profiler
+        g.profile_trigger = trigger
+        profiler.enable()
+
+    def _finish(self, response):
+        profiler = g.pop('profiler', None)
+        elapsed = time.perf_counter() - g.get('profile_started', time.perf_counter())
+
+        if profiler is None:
+            self._check_slow(elapsed)
+            return response
+
+        profiler.disable()
+        self._busy.release()
+
+        try:
+            filename = self._write(profiler, elapsed)
+            response.headers['X-Profile-Id'] = filename
+            metrics_service.inc('profiles_captured_total', trigger=g.get('profile_trigger'))
+        except OSError as e:
+            print(f"Error writing request profile: {e}")
+        return response
+
+    def _teardown(self, exc):
+        # after_request is skipped when the view raised; never leave the
+        # profiler running or the lock held
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._busy.release()
+
+    def _check_slow(self, elapsed):
+        if not self.slow_threshold or elapsed < self.slow_threshold:
+            return
+        route = self._route()
+        now = time.monotonic()
+        if now - self._last_slow_capture.get(route, -self.slow_cooldown) >= self.slow_cooldown:
+            self._last_slow_capture[route] = now
+            self._armed_routes.add(route)
+
+    def _write(self, profiler, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        route = re.sub(r'[^A-Za-z0-9]+', '_', self._route()).strip('_') or 'root'
+        filename = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}_{os.getpid()}_{request.method}_{route}"
+            f"_{int(elapsed * 1000)}ms.prof"
+        )
+        profiler.dump_stats(os.path.join(self.directory, filename))
+        self._prune()
+        return filename
+
+    def _prune(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, '*.prof')), key=os.path.getmtime)
+        for path in paths[:max(len(paths) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+# Global instance
+request_profiler = RequestProfiler()
@@ -0,0 +1,12 @@
+from src.models.user import db
+
+class QueueDay(db.Model):
+    """Running queue counters for one token day, updated on every booking and consultation"""
+    day = db.Column(db.String(8), primary_key=True)  # YYYYMMDD prefix of the day's tokens
+    booked = db.Column(db.Integer, nullable=False, default=0)
+    served = db.Column(db.Integer, nullable=False, default=0)  # appointments that have received prescriptions
+    last_served_at = db.Column(db.Float)  # unix time of the latest consultation
+    avg_consultation_seconds = db.Column(db.Float)  # exponentially weighted, see QueueService
+
+    def __repr__(self):
+        return f'<QueueDay {self.day}>'
@@ -0,0 +1,155 @@
+import os
+import re
+import time
+
+from sqlalchemy import case, insert, select, update
+
+from src.cache import MISS, TTLCache
+from src.flush_changes import prescribed_appointments
+from src.lazy import lazy_instance, listen
+from src.models.user import db
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+from src.models.queue_day import QueueDay
+from src.services.token_cache_service import token_cache_service
+
+TOKEN_PATTERN = re.compile(r'^(\d{8})(\d{3,})$')  # YYYYMMDDNNN
+
+class QueueService:
+    """
+    Queue position and wait estimates for today's tokens.
+
+    QueueDay keeps, per token day, how many appointments were booked and how
+    many have been seen, plus a rolling average of the time between
+    consultations. A session after_flush hook updates the row in the same
+    transaction as the booking or first prescription, with single UPDATE
+    statements so concurrent writers cannot lose increments. A poll then
+    reads one cached row and the (cached) appointment, however many patients
+    are waiting.
+
+    Patients are assumed to be seen in token order, so the number ahead is
+    the token's sequence number minus the consultations done so far.
+    """
+
+    def __init__(self):
+        self.smoothing = float(os.getenv('QUEUE_AVG_SMOOTHING', 0.2))
+        # Gaps longer than this (breaks, end of day) are not consultations
+        self.max_gap_seconds = float(os.getenv('QUEUE_MAX_GAP_MINUTES', 60)) * 60
+        self.default_consultation_seconds = float(os.getenv('QUEUE_DEFAULT_CONSULTATION_MINUTES', 10)) * 60
+        self.cache = TTLCache(max_entries=64, ttl=float(os.getenv('QUEUE_CACHE_TTL', 2)))
+
+    def get_position(self, token: str):
+        """
+        Where a token stands in its day's queue
+
+        Returns:
+            dict or None: queue position and wait estimate, None if the token is unknown
+        """
+        match = TOKEN_PATTERN.match(token)
+        if not match:
+            return None
+        appointment = token_cache_service.lookup(token)
+        if appointment is None:
+            return None
+
+        day, sequence = match.group(1), int(match.group(2))
+        counters = self._get_counters(day)
+        average = counters['avg_consultation_seconds'] or self.default_consultation_seconds
+
+        if appointment.get('prescriptions'):
+            ahead, status = 0, 'served'
+        else:
+            ahead = max(sequence - 1 - counters['served'], 0)
+            status = 'waiting'
+
+        return {
+            'token': token,
+            'status': status,
+            'patients_ahead': ahead,
+            'booked_today': counters['booked'],
+            'served_today': counters['served'],
+            'avg_consultation_minutes': round(average / 60, 1),
+            'estimated_wait_minutes': round(ahead * average / 60) if status == 'waiting' else 0
+        }
+
+    def backfill(self, day: str) -> dict:
+        """Recount a day's booked and served appointments from the raw tables (e.g. on first deploy)"""
+        day_appointments = Appointment.query.filter(Appointment.token.like(f'{day}%'))
+        booked = day_appointments.count()
+        served = day_appointments.filter(
+            Appointment.id.in_(select(Prescription.appointment_id))
+        ).count()
+
+        row = db.session.get(QueueDay, day)
+        if row is None:
+            row = QueueDay(day=day)
+            db.session.add(row)
+        row.booked, row.served = booked, served
+        db.session.commit()
+        self.cache.invalidate(day)
+        return {'booked': booked, 'served': served}
+
+    def _get_counters(self, day):
+        counters = self.cache.get(day)
+        if counters is MISS:
+            row = db.session.get(QueueDay, day)
+            counters = {
+                'booked': row.booked if row else 0,
+                'served': row.served if row else 0,
+                'avg_consultation_seconds': row.avg_consultation_seconds if row else None
+            }
+            self.cache.set(day, counters)
+        return counters
+
+    def _after_flush(self, session, flush_context):
+        booked = {}
+        prescribed = False
+
+        for obj in session.new:
+            if isinstance(obj, Appointment):
+                match = TOKEN_PATTERN.match(obj.token or '')
+                if match:
+                    booked[match.group(1)] = booked.get(match.group(1), 0) + 1
+            elif isinstance(obj, Prescription):
+                prescribed = True
+
+        if not booked and not prescribed:
+            return
+
+        conn = session.connection()
+        for day, count in booked.items():
+            self._upsert(conn, day, {'booked': QueueDay.booked + count}, {'booked': count})
+
+        now = time.time()
+        for appointment in prescribed_appointments(session, flush_context).values():
+            match = TOKEN_PATTERN.match(appointment['token'] or '')
+            # The appointment is served with its first prescriptions
+            if not match or not appointment['first']:
+                continue
+
+            gap = now - QueueDay.last_served_at
+            average = case(
+                (QueueDay.last_served_at.is_(None), QueueDay.avg_consultation_seconds),
+                (gap > self.max_gap_seconds, QueueDay.avg_consultation_seconds),
+                (QueueDay.avg_consultation_seconds.is_(None), gap),
+                else_=QueueDay.avg_consultation_seconds + self.smoothing * (gap - QueueDay.avg_consultation_seconds)
+            )
+            self._upsert(
+                conn, match.group(1),
+                {'served': QueueDay.served + 1, 'avg_consultation_seconds': average, 'last_served_at': now},
+                {'served': 1, 'last_served_at': now}
+            )
+
+    @staticmethod
+    def _upsert(conn, day, changes, initial):
+        # Single-statement updates keep concurrent increments from being lost
+        result = conn.execute(update(QueueDay.__table__).where(QueueDay.day == day).values(changes))
+        if result.rowcount == 0:
+            conn.execute(insert(QueueDay.__table__).values({'day': day, 'booked': 0, 'served': 0, **initial}))
+
+def register_listeners(session_class):
+    """Maintain the queue counters for sessions of the given class"""
+    listen(session_class, queue_service, 'after_flush')
+
+# Global instance, built on first use
+queue_service = lazy_instance(QueueService)
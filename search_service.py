@@ -0,0 +1,181 @@
+import re
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import OperationalError
+
+from src.lazy import lazy_instance
+from src.models.user import db
+from src.models.appointment import Appointment
+
+# Trigram tokenizer (SQLite >= 3.34) matches any 3+ character substring,
+# which covers partial names and phone fragments; older SQLite falls back to
+# word tokens with prefix matching.
+SQLITE_TRIGRAM_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS appointment_fts USING fts5(
+    name, phone, issue, content='appointment', content_rowid='id', tokenize='trigram'
+)
+"""
+SQLITE_WORD_DDL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS appointment_fts USING fts5(
+    name, phone, issue, content='appointment', content_rowid='id', tokenize='unicode61'
+)
+"""
+SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS appointment_fts_insert AFTER INSERT ON appointment BEGIN
+        INSERT INTO appointment_fts(rowid, name, phone, issue) VALUES (new.id, new.name, new.phone, new.issue);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS appointment_fts_delete AFTER DELETE ON appointment BEGIN
+        INSERT INTO appointment_fts(appointment_fts, rowid, name, phone, issue)
+        VALUES ('delete', old.id, old.name, old.phone, old.issue);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS appointment_fts_update AFTER UPDATE OF name, phone, issue ON appointment BEGIN
+        INSERT INTO appointment_fts(appointment_fts, rowid, name, phone, issue)
+        VALUES ('delete', old.id, old.name, old.phone, old.issue);
+        INSERT INTO appointment_fts(rowid, name, phone, issue) VALUES (new.id, new.name, new.phone, new.issue);
+    END
+    """,
+]
+
+POSTGRES_TEXT = "(coalesce(name, '') || ' ' || coalesce(phone, '') || ' ' || coalesce(issue, ''))"
+POSTGRES_DOCUMENT = f"to_tsvector('simple', {POSTGRES_TEXT})"
+POSTGRES_INDEX = f"CREATE INDEX IF NOT EXISTS ix_appointment_search ON appointment USING GIN ({POSTGRES_DOCUMENT})"
+# Substring matches (phone fragments, middle of a name) use ILIKE, which a
+# pg_trgm index serves for terms of 3+ characters
+POSTGRES_TRIGRAM_INDEX = (
+    f"CREATE INDEX IF NOT EXISTS ix_appointment_search_trgm ON appointment USING GIN ({POSTGRES_TEXT} gin_trgm_ops)"
+)
+
+class AppointmentSearchService:
+    """
+    Full-text search over appointment name, phone and issue.
+
+    SQLite uses an external-content FTS5 table kept in sync by triggers and
+    ranked with bm25(); terms shorter than the trigram tokenizer's 3
+    characters fall back to LIKE. Postgres matches every term as a substring
+    with ILIKE (served by a pg_trgm index when the extension is available)
+    and ranks with ts_rank() over a tsvector GIN index. Other databases use
+    LIKE, which scans the table.
+    """
+
+    def __init__(self):
+        self._sqlite_trigram = None  # detected on first SQLite search
+
+    def install(self, conn):
+        """Create the search index for the connection's database (idempotent)"""
+        dialect = conn.dialect.name
+
+        if dialect == 'sqlite':
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'appointment_fts'"
+            )).first()
+            if exists:
+                return
+            try:
+                conn.execute(text(SQLITE_TRIGRAM_DDL))
+            except OperationalError:
+                conn.execute(text(SQLITE_WORD_DDL))
+            for trigger in SQLITE_TRIGGERS:
+                conn.execute(text(trigger))
+            # Index rows that existed before the FTS table
+            conn.execute(text("INSERT INTO appointment_fts(appointment_fts) VALUES ('rebuild')"))
+
+        elif dialect == 'postgresql':
+            conn.execute(text(POSTGRES_INDEX))
+            try:
+                with conn.begin_nested():
+                    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    conn.execute(text(POSTGRES_TRIGRAM_INDEX))
+            except OperationalError as e:
+                # Without the extension ILIKE still works, with a table scan
+                print(f"pg_trgm unavailable, substring search will scan the table: {e}")
+
+    def search(self, query: str, page: int = 1, per_page: int = 20) -> dict:
+        """
+        Search appointments, best matches first
+
+        Args:
+            query: Free text (name, phone fragment or complaint words)
+            page: 1-based page number
+            per_page: Results per page
+
+        Returns:
+            dict: results for the page and the total number of matches
+        """
+        terms = [term for term in re.findall(r'\w+', query.lower()) if term]
+        if not terms:
+            return {'results': [], 'total': 0, 'page': page, 'per_page': per_page}
+
+        dialect = db.session.get_bind().dialect.name
+        offset = (page - 1) * per_page
+
+        if dialect == 'sqlite':
+            ids, total = self._search_sqlite(terms, per_page, offset)
+        elif dialect == 'postgresql':
+            ids, total = self._search_postgres(terms, per_page, offset)
+        else:
+            ids, total = self._search_like(terms, per_page, offset)
+
+        appointments = {a.id: a for a in Appointment.query.filter(Appointment.id.in_(ids)).all()} if ids else {}
+        return {
+            'results': [appointments[i].to_dict() for i in ids if i in appointments],
+            'total': total,
+            'page': page,
+            'per_page': per_page
+        }
+
+    def _search_sqlite(self, terms, limit, offset):
+        if self._sqlite_trigram is None:
+            self._sqlite_trigram = 'trigram' in (db.session.execute(text(
+                "SELECT sql FROM sqlite_master WHERE name = 'appointment_fts'"
+            )).scalar() or '')
+        if self._sqlite_trigram:
+            # Trigram tokens cannot match fewer than 3 characters
+            if any(len(term) < 3 for term in terms):
+                return self._search_like(terms, limit, offset)
+            match = ' AND '.join(f'"{term}"' for term in terms)
+        else:
+            match = ' AND '.join(f'"{term}"*' for term in terms)
+
+        ids = db.session.execute(text(
+            "SELECT rowid FROM appointment_fts WHERE appointment_fts MATCH :match "
+            "ORDER BY bm25(appointment_fts) LIMIT :limit OFFSET :offset"
+        ), {'match': match, 'limit': limit, 'offset': offset}).scalars().all()
+        total = db.session.execute(text(
+            "SELECT count(*) FROM appointment_fts WHERE appointment_fts MATCH :match"
+        ), {'match': match}).scalar()
+        return ids, total
+
+    def _search_postgres(self, terms, limit, offset):
+        # Every term must appear somewhere (as a substring); word-prefix
+        # matches rank higher
+        params = {f'term{i}': f'%{term}%' for i, term in enumerate(terms)}
+        where = ' AND '.join(f"{POSTGRES_TEXT} ILIKE :term{i}" for i in range(len(terms)))
+        tsquery = ' | '.join(f'{term}:*' for term in terms)
+
+        ids = db.session.execute(text(
+            f"SELECT id FROM appointment WHERE {where} "
+            f"ORDER BY ts_rank({POSTGRES_DOCUMENT}, to_tsquery('simple', :tsquery)) DESC, id DESC "
+            "LIMIT :limit OFFSET :offset"
+        ), {**params, 'tsquery': tsquery, 'limit': limit, 'offset': offset}).scalars().all()
+        total = db.session.execute(text(
+            f"SELECT count(*) FROM appointment WHERE {where}"
+        ), params).scalar()
+        return ids, total
+
+    def _search_like(self, terms, limit, offset):
+        filters = [
+            or_(Appointment.name.ilike(f'%{term}%'), Appointment.phone.ilike(f'%{term}%'),
+                Appointment.issue.ilike(f'%{term}%'))
+            for term in terms
+        ]
+        query = Appointment.query.filter(*filters)
+        ids = [a.id for a in query.order_by(Appointment.timestamp.desc()).limit(limit).offset(offset)]
+        return ids, query.count()
+
+# Global instance, built on first use
+appointment_search_service = lazy_instance(AppointmentSearchService)
@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, current_app, has_app_context, request
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are produced without it
+    brotli = None
+
+# Files larger than this are streamed from disk instead of held in memory
+MAX_CACHED_BYTES = 2 * 1024 * 1024
+
+# Skip compressing tiny files, the headers would outweigh the savings
+MIN_COMPRESS_BYTES = 512
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# app.3f2a9c1b.js, logo-5d41402abc4b.png, ...
+FINGERPRINT_PATTERN = re.compile(r'[.-][0-9a-f]{8,}\.[A-Za-z0-9]+$')
+
+LONG_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+
+
+class StaticAsset:
+    """An in-memory static file with its precompressed variants."""
+
+    def __init__(self, rel_path, full_path):
+        with open(full_path, 'rb') as f:
+            data = f.read()
+
+        self.rel_path = rel_path
+        self.full_path = full_path
+        self.mtime = os.path.getmtime(full_path)
+        self.mimetype = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.fingerprinted = bool(FINGERPRINT_PATTERN.search(os.path.basename(rel_path)))
+
+        # encoding -> body ('identity' is always present)
+        self.variants = {'identity': data}
+        if len(data) >= MIN_COMPRESS_BYTES and self.mimetype.startswith(COMPRESSIBLE_TYPES):
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants['br'] = compressed
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants['gzip'] = compressed
+
+    def etag(self, encoding):
+        # Strong ETags must differ between encoded representations
+        return self.digest if encoding == 'identity' else f'{self.digest}-{encoding}'
+
+
+class StaticAssetCache:
+    """
+    Serves the static folder from memory.
+
+    All files are read, hashed and compressed once at startup. Responses carry
+    strong ETags, honour If-None-Match and pick a brotli/gzip body based on
+    Accept-Encoding. Fingerprinted files (hash in the name, or requested with
+    ?v=<digest>) get a one-year immutable Cache-Control; everything else is
+    revalidated. With watch=True (development) files are re-read when their
+    mtime changes and new files are picked up on first request. watch=None
+    follows the app's debug flag at request time, so `app.run(debug=True)`
+    watches even though the cache was built before debug was switched on.
+    """
+
+    def __init__(self, root, watch=None, dynamic_dirs=('prescriptions',)):
+        self.root = os.path.abspath(root)
+        self.watch = watch
+        # Directories written at runtime (e.g. generated PDFs) are never cached
+        self.dynamic_dirs = tuple(dynamic_dirs)
+        self.assets = {}
+        # Files too large to hold in memory; served from disk as-is
+        self.passthrough = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read every cacheable file under root into memory."""
+        assets = {}
+        passthrough = set()
+        if os.path.isdir(self.root):
+            for dirpath, dirnames, filenames in os.walk(self.root):
+                rel_dir = os.path.relpath(dirpath, self.root)
+                if rel_dir != '.' and rel_dir.split(os.sep)[0] in self.dynamic_dirs:
+                    dirnames[:] = []
+                    continue
+                for filename in filenames:
+                    full_path = os.path.join(dirpath, filename)
+                    rel_path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                    asset = self._load_asset(rel_path, full_path)
+                    if asset is not None:
+                        assets[rel_path] = asset
+                    else:
+                        passthrough.add(rel_path)
+        self.assets = assets
+        self.passthrough = passthrough
+        return self
+
+    def get(self, path):
+        """Return the cached asset for a relative path, or None."""
+        asset = self.assets.get(path)
+        if not self.watching():
+            return asset
+
+        if self.is_dynamic(path):
+            return None
+
+        full_path = os.path.join(self.root, path)
+        if asset is not None:
+            try:
+                if os.path.getmtime(full_path) == asset.mtime:
+                    return asset
+            except OSError:
+                # File was deleted
+                with self._lock:
+                    self.assets.pop(path, None)
+                return None
+        elif not self._is_inside_root(full_path) or not os.path.isfile(full_path):
+            return None
+
+        asset = self._load_asset(path, full_path)
+        if asset is not None:
+            with self._lock:
+                self.assets[path] = asset
+        return asset
+
+    def watching(self):
+        if self.watch is not None:
+            return self.watch
+        return has_app_context() and current_app.debug
+
+    def is_dynamic(self, path):
+        return path.split('/', 1)[0] in self.dynamic_dirs
+
+    def serves_from_disk(self, path):
+        """True for paths that bypass the cache (runtime output, oversized files)."""
+        return self.is_dynamic(path) or path in self.passthrough
+
+    def url_for(self, path):
+        """Cache-busting URL for an asset: /<path>?v=<digest>."""
+        asset = self.get(path)
+        return f'/{path}?v={asset.digest}' if asset else f'/{path}'
+
+    def response(self, asset):
+        """Build the response for the current request."""
+        encoding = self._negotiate_encoding(asset)
+        etag = asset.etag(encoding)
+
+        if asset.fingerprinted or request.args.get('v') == asset.digest:
+            cache_control = LONG_CACHE
+        else:
+            cache_control = REVALIDATE
+
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    def _negotiate_encoding(self, asset):
+        accepted = request.accept_encodings
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.variants and accepted[encoding] > 0:
+                return encoding
+        return 'identity'
+
+    def _load_asset(self, rel_path, full_path):
+        try:
+            if os.path.getsize(full_path) > MAX_CACHED_BYTES:
+                return None
+            return StaticAsset(rel_path, full_path)
+        except OSError:
+            return None
+
+    def _is_inside_root(self, full_path):
+        return os.path.abspath(full_path).startswith(self.root + os.sep)
@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify, request
+from src.services.analytics_service import analytics_service
+from src.db_profile import read_only
+
+stats_bp = Blueprint('stats', __name__)
+
+@stats_bp.route('', methods=['GET'])
+@read_only
+def get_stats():
+    """Clinic statistics from the incrementally maintained summary tables"""
+    try:
+        days = min(max(request.args.get('days', 30, type=int), 1), 366)
+        top = min(max(request.args.get('top', 10, type=int), 1), 100)
+        return jsonify(analytics_service.get_stats(days=days, top=top)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,145 @@
+import os
+import sqlite3
+
+from flask import g, has_request_context
+from sqlalchemy import select
+
+from src.cache import MISS, InvalidationLog, TTLCache
+from src.flush_changes import prescribed_appointments
+from src.lazy import lazy_instance, listen
+from src.models.appointment import Appointment
+from src.models.prescription import Prescription
+from src.services.archive_service import archive_service
+from src.services.metrics_service import metrics_service
+
+metrics_service.counter('token_cache_lookups_total', 'Token lookups by cache result (hit, negative_hit, miss, bypass)')
+metrics_service.counter('token_cache_db_queries_saved_total', 'SQL statements avoided by token cache hits')
+metrics_service.gauge('token_cache_hit_ratio', 'Share of token lookups answered from the cache')
+metrics_service.gauge('token_cache_entries', 'Tokens cached in this worker')
+
+class TokenCacheService:
+    """
+    Read-through cache for appointment lookups by token.
+
+    Patients poll their token while waiting for a prescription, so results
+    are cached per worker in a bounded TTL+LRU cache, including "not found"
+    (with a shorter TTL). When an appointment or one of its prescriptions is
+    committed, its token is published to a shared InvalidationLog; every
+    worker applies the log before answering from its cache, so a change is
+    visible on the next poll whichever worker serves it. If the log cannot be
+    read the cache is bypassed.
+    """
+
+    def __init__(self):
+        ttl = float(os.getenv('TOKEN_CACHE_TTL', 300))
+        self.negative_ttl = float(os.getenv('TOKEN_CACHE_NEGATIVE_TTL', 30))
+        self.cache = TTLCache(max_entries=int(os.getenv('TOKEN_CACHE_SIZE', 4096)), ttl=ttl)
+        self.invalidations = InvalidationLog('tokens', retention=max(ttl, self.negative_ttl))
+        self._hits = 0
+        self._lookups = 0
+
+    def lookup(self, token: str):
+        """
+        Find an appointment (hot or archived) by token
+
+        Returns:
+            dict or None: The appointment with its prescriptions, None if not found
+        """
+        if not self._sync():
+            self._record('bypass')
+            return self._load(token)
+
+        entry = self.cache.get(token)
+        if entry is not MISS:
+            appointment, queries = entry
+            self._record('hit' if appointment is not None else 'negative_hit')
+            metrics_service.inc('token_cache_db_queries_saved_total', queries)
+            return appointment
+
+        queries_before = self._query_count()
+        appointment = self._load(token)
+        queries = self._query_count() - queries_before
+
+        self.cache.set(token, (appointment, queries), ttl=None if appointment is not None else self.negative_ttl)
+        self._record('miss')
+        return appointment
+
+    def _load(self, token):
+        appointment = Appointment.query.filter_by(token=token).first()
+        if appointment:
+            return appointment.to_dict()
+
+        # Old appointments are moved to the cold archive
+        return archive_service.find_by_token(token)
+
+    def _sync(self):
+        """Apply invalidations published by any worker; False if the log is unavailable"""
+        try:
+            changed = self.invalidations.changes()
+        except sqlite3.Error as e:
+            print(f"Token cache invalidation log error: {e}")
+            self.cache.clear()
+            return False
+
+        if changed is None:
+            self.cache.clear()
+        else:
+            for token in changed:
+                self.cache.invalidate(token)
+        return True
+
+    def _record(self, result):
+        self._lookups += 1
+        if result in ('hit', 'negative_hit'):
+            self._hits += 1
+        metrics_service.inc('token_cache_lookups_total', result=result)
+        metrics_service.set('token_cache_hit_ratio', round(self._hits / self._lookups, 4))
+        metrics_service.set('token_cache_entries', len(self.cache))
+
+    @staticmethod
+    def _query_count():
+        # Counted by src.instrumentation for the current request
+        return g.get('db_query_count', 0) if has_request_context() else 0
+
+    def _after_flush(self, session, flush_context):
+        tokens = set()
+        appointment_ids = set()  # of edited or deleted prescriptions
+
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, Appointment):
+                tokens.add(obj.token)
+            elif isinstance(obj, Prescription) and obj not in session.new:
+                appointment_ids.add(obj.appointment_id)
+
+        tokens.update(appointment['token'] for appointment in prescribed_appointments(session, flush_context).values())
+        if appointment_ids:
+            tokens.update(session.connection().execute(
+                select(Appointment.token).where(Appointment.id.in_(appointment_ids))
+            ).scalars())
+
+        tokens.discard(None)
+        if tokens:
+            session.info.setdefault('token_cache_changed', set()).update(tokens)
+
+    def _after_commit(self, session):
+        tokens = session.info.pop('token_cache_changed', None)
+        if not tokens:
+            return
+        for token in tokens:
+            self.cache.invalidate(token)
+        try:
+            self.invalidations.publish(tokens)
+        except sqlite3.Error as e:
+            # Other workers catch up when their entries expire
+            print(f"Token cache invalidation log error: {e}")
+
+    def _after_rollback(self, session):
+        # The flushed changes are gone, and a later commit on this session must not publish them
+        session.info.pop('token_cache_changed', None)
+
+def register_listeners(session_class):
+    """Publish invalidations for changes committed through sessions of the given class"""
+    listen(session_class, token_cache_service, 'after_flush', 'after_commit', 'after_rollback')
+
+# Global instance, built on first use
+token_cache_service = lazy_instance(TokenCacheService)
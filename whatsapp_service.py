@@ -1,12 +1,20 @@
 import os
+import time
 from typing import List, Dict
 from datetime import datetime
+from src.concurrency import run_blocking
+from src.lazy import lazy_instance
+from src.services.metrics_service import metrics_service
 
 class WhatsAppService:
     """
     WhatsApp messaging service for sending prescription details and PDF files.
     This is a mock implementation that simulates WhatsApp message sending.
     In production, you would integrate with Twilio WhatsApp API or WhatsApp Business API.
+    
+    Safe under gevent workers: log file writes run through run_blocking, and
+    HTTP calls made by an API client are cooperative once the standard
+    library is monkey-patched (see gunicorn.conf.py).
     """
     
     def __init__(self):
@@ -30,16 +38,21 @@ class WhatsAppService:
         Returns:
             bool: True if message sent successfully, False otherwise
         """
+        started = time.perf_counter()
         try:
             message = self._format_prescription_message(patient_name, token, prescriptions)
             
             if self.mock_mode:
-                return self._send_mock_message(phone_number, message)
+                sent = self._send_mock_message(phone_number, message)
             else:
-                return self._send_twilio_message(phone_number, message)
+                sent = self._send_twilio_message(phone_number, message)
+            
+            self._record_send('text', sent, started)
+            return sent
                 
         except Exception as e:
             print(f"Error sending WhatsApp message: {str(e)}")
+            self._record_send('text', False, started)
             return False
     
     def send_prescription_pdf(self, patient_name: str, phone_number: str, token: str, pdf_file_path: str) -> Dict:
@@ -55,9 +68,11 @@ class WhatsAppService:
         Returns:
             dict: Result of the PDF sending operation
         """
+        started = time.perf_counter()
         try:
             # Check if PDF file exists
             if not os.path.exists(pdf_file_path):
+                self._record_send('pdf', False, started)
                 return {
                     'success': False,
                     'error': 'PDF file not found'
@@ -70,16 +85,25 @@ class WhatsAppService:
             message = self._format_pdf_message(patient_name, token)
             
             if self.mock_mode:
-                return self._send_mock_pdf(phone_number, message, pdf_file_path, file_size_mb)
+                result = self._send_mock_pdf(phone_number, message, pdf_file_path, file_size_mb)
             else:
-                return self._send_twilio_pdf(phone_number, message, pdf_file_path)
+                result = self._send_twilio_pdf(phone_number, message, pdf_file_path)
+            
+            self._record_send('pdf', result.get('success', False), started)
+            return result
                 
         except Exception as e:
+            self._record_send('pdf', False, started)
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _record_send(self, kind: str, success: bool, started: float):
+        """Record a send attempt in the metrics registry"""
+        metrics_service.observe('whatsapp_send_duration_seconds', time.perf_counter() - started, kind=kind)
+        metrics_service.inc('whatsapp_messages_total', kind=kind, result='success' if success else 'failure')
+    
     def _format_prescription_message(self, patient_name: str, token: str, prescriptions: List[Dict]) -> str:
         """Format the prescription message for WhatsApp"""
         message = f"🏥 *MediCare Prescription*\n\n"
@@ -129,12 +153,13 @@ class WhatsAppService:
         
         # Log the message to a file for demo purposes
         try:
-            with open(self.log_file, 'a') as f:
-                f.write(f"\n{'='*50}\n")
-                f.write(f"Timestamp: {datetime.now()}\n")
-                f.write(f"To: {phone_number}\n")
-                f.write(f"Message:\n{message}\n")
-                f.write(f"{'='*50}\n")
+            run_blocking(self._append_log, (
+                f"\n{'='*50}\n"
+                f"Timestamp: {datetime.now()}\n"
+                f"To: {phone_number}\n"
+                f"Message:\n{message}\n"
+                f"{'='*50}\n"
+            ))
         except Exception as e:
             print(f"Error logging message: {e}")
         
@@ -154,13 +179,14 @@ class WhatsAppService:
         
         # Log the PDF message
         try:
-            with open(self.log_file, 'a') as f:
-                f.write(f"\n{'='*50}\n")
-                f.write(f"PDF MESSAGE - Timestamp: {datetime.now()}\n")
-                f.write(f"To: {phone_number}\n")
-                f.write(f"Message:\n{message}\n")
-                f.write(f"PDF File: {pdf_file_path} ({file_size_mb:.2f} MB)\n")
-                f.write(f"{'='*50}\n")
+            run_blocking(self._append_log, (
+                f"\n{'='*50}\n"
+                f"PDF MESSAGE - Timestamp: {datetime.now()}\n"
+                f"To: {phone_number}\n"
+                f"Message:\n{message}\n"
+                f"PDF File: {pdf_file_path} ({file_size_mb:.2f} MB)\n"
+                f"{'='*50}\n"
+            ))
         except Exception as e:
             print(f"Error logging PDF message: {e}")
         
@@ -171,6 +197,11 @@ class WhatsAppService:
             'file_size': f"{file_size_mb:.2f} MB"
         }
     
+    def _append_log(self, entry: str):
+        """Append one entry to the message log in a single write, so concurrent sends do not interleave"""
+        with open(self.log_file, 'a') as f:
+            f.write(entry)
+    
     def _send_twilio_message(self, phone_number: str, message: str) -> bool:
         """
         Send actual WhatsApp message using Twilio API
@@ -248,5 +279,5 @@ class WhatsAppService:
         file_size_mb = file_size / (1024 * 1024)
         return self._send_mock_pdf(phone_number, message, pdf_file_path, file_size_mb)
 
-# Global instance
-whatsapp_service = WhatsAppService()
+# Global instance, built on first use
+whatsapp_service = lazy_instance(WhatsAppService)